@@ -1,22 +1,75 @@
-import base64
+import atexit
+import binascii
+import copy
+import gc
+import hashlib
 import os
+import queue
+import re
+import secrets
+import threading
+import time
+import unicodedata
 import uuid
 import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import subprocess
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
 from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from pathlib import Path
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Emu, Inches, Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
 from docx.shared import RGBColor
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-from flask import Flask, jsonify, request, render_template, redirect, url_for, flash, session, send_file
-from werkzeug.utils import secure_filename
-from html import escape
-import shutil  
+from docx.oxml.ns import nsdecls
+from docx.oxml import parse_xml
+from docx.image.image import Image as DocxImage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import XmlPart
+from docx.opc.pkgwriter import PackageWriter
+from lxml.etree import xmlfile
+from flask import Flask, request, render_template, redirect, url_for, flash, session, send_file, abort
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from werkzeug.wsgi import FileWrapper
+from werkzeug.security import safe_join
+import shutil
+from zlib import adler32
+import sqlite3
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+try:
+    from a2wsgi import WSGIMiddleware
+    from starlette.responses import FileResponse
+except ImportError:
+    WSGIMiddleware = None
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+except ImportError:
+    uno = None
 
 app = Flask(__name__, static_folder='static')
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key')
@@ -26,54 +79,485 @@ app.config['DOCX_DIR'] = os.path.join(os.getcwd(), 'temp_docx')
 app.config['OUTPUT_DIR'] = os.path.join(os.getcwd(), 'temp_pdf')
 app.config['SIGNATURE_DIR'] = os.path.join(os.getcwd(), 'temp_signatures')
 app.config['EDIT_HISTORY_DIR'] = os.path.join(os.getcwd(), 'edit_history')
-
-# Ensure directories exist
-for directory in [app.config['DOCX_DIR'], app.config['OUTPUT_DIR'], app.config['SIGNATURE_DIR'], app.config['EDIT_HISTORY_DIR']]:
-    os.makedirs(directory, exist_ok=True)
-
-# Logging setup
+app.config['SOFFICE_PROFILE_DIR'] = os.path.join(os.getcwd(), 'soffice_profiles')
+app.config['PDF_CACHE_DIR'] = os.path.join(os.getcwd(), 'pdf_cache')
+app.config['FILE_REGISTRY_DB'] = os.path.join(os.getcwd(), 'file_registry.sqlite3')
+app.config['JINJA_CACHE_DIR'] = os.path.join(os.getcwd(), 'jinja_cache')
+
+def ensure_dirs():
+    for directory in [app.config['DOCX_DIR'], app.config['OUTPUT_DIR'], app.config['SIGNATURE_DIR'], app.config['EDIT_HISTORY_DIR'], app.config['SOFFICE_PROFILE_DIR'], app.config['PDF_CACHE_DIR'], app.config['JINJA_CACHE_DIR']]:
+        os.makedirs(directory, exist_ok=True)
+
+# Ensure directories exist. Every worker process runs this; makedirs with
+# exist_ok is cheap when they are already there.
+ensure_dirs()
+
+# Compiled templates are kept on disk, so new worker processes load them
+# instead of compiling them again
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+
+# Logging setup: request threads only enqueue records; a listener thread
+# formats them and writes to stderr, or to LOG_FILE when set. Set
+# LOG_LEVEL=DEBUG for verbose output.
+_log_handler = logging.FileHandler(os.environ['LOG_FILE']) if os.getenv('LOG_FILE') else logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(message)s',
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 # LibreOffice path
-LIBREOFFICE_PATH = r"program\LibreOffice\program\soffice.exe"
+LIBREOFFICE_PATH = os.getenv('LIBREOFFICE_PATH', r"program\LibreOffice\program\soffice.exe")
+
+# LibreOffice worker pool: each worker owns a user profile (and UNO port), so
+# conversions never share a profile and can run in parallel
+SOFFICE_POOL_SIZE = int(os.getenv('SOFFICE_POOL_SIZE', '2'))
+SOFFICE_BASE_PORT = int(os.getenv('SOFFICE_BASE_PORT', '2002'))
+# Index of this process's first worker (port and profile), so several app
+# processes on one host get disjoint pools (see deploy/gunicorn_conf.py)
+SOFFICE_FIRST_INDEX = int(os.getenv('SOFFICE_FIRST_INDEX', '0'))
+SOFFICE_MAX_JOBS = int(os.getenv('SOFFICE_MAX_JOBS', '200'))
+SOFFICE_TIMEOUT = int(os.getenv('SOFFICE_TIMEOUT', '120'))
+# Start the workers at import instead of on the first conversion, so the
+# LibreOffice servers are already listening when the first request arrives
+SOFFICE_PRESTART = os.getenv('SOFFICE_PRESTART', '0') == '1'
+
+# Concurrent conversions are coalesced into batches of up to PDF_BATCH_SIZE
+# documents collected over PDF_BATCH_WINDOW_MS
+PDF_BATCH_SIZE = int(os.getenv('PDF_BATCH_SIZE', '10'))
+PDF_BATCH_WINDOW_MS = int(os.getenv('PDF_BATCH_WINDOW_MS', '100'))
+
+# Threads running background agreement generations (see /status/<job_id>)
+PDF_JOB_WORKERS = int(os.getenv('PDF_JOB_WORKERS', '8'))
+PDF_JOBS = ThreadPoolExecutor(max_workers=PDF_JOB_WORKERS, thread_name_prefix='pdf-job')
+# A job still pending after this many seconds is reported as failed: its
+# worker was recycled, killed or crashed before it could record the outcome
+PDF_JOB_TIMEOUT = int(os.getenv('PDF_JOB_TIMEOUT', SOFFICE_TIMEOUT + 60))
+
+# Rendered agreements kept in PDF_CACHE_DIR, shared across sessions; the
+# least recently used are pruned beyond this many. Entries are signed
+# agreements (PDF and DOCX, signatures embedded) at rest, so each is
+# registered to the sessions that rendered or reused it and removed when the
+# last of them logs out.
+PDF_CACHE_SIZE = int(os.getenv('PDF_CACHE_SIZE', '500'))
 
 # API Base URL
 BASE_URL = os.getenv('API_BASE_URL', 'https://api-ticket-system.chervicaon.com/api/v1')
 
+# Shared client for the API: pooled keep-alive connections, with retries on
+# gateway errors. It is shared by all users, so its cookie jar refuses to
+# store anything and auth cookies are passed explicitly on each call.
+API_SESSION = requests.Session()
+API_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+API_SESSION.headers.update({'Connection': 'keep-alive', 'Content-Type': 'application/json'})
+for prefix in ('https://', 'http://'):
+    API_SESSION.mount(prefix, HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+    ))
+
+# Upstream cookies worth keeping in the session (comma-separated names). When
+# unset, every cookie is kept except well-known analytics/tracking ones, which
+# would otherwise ride along in the session cookie on every request.
+API_AUTH_COOKIES = {name.strip() for name in os.getenv('API_AUTH_COOKIES', '').split(',') if name.strip()}
+TRACKING_COOKIE_PREFIXES = ('_ga', '_gid', '_gat', '_gcl', '_fbp', '_fbc', '_hj', '_clck', '_clsk', '__utm', 'ajs_', 'mp_', 'AMP_')
+
+def is_auth_cookie(name):
+    if API_AUTH_COOKIES:
+        return name in API_AUTH_COOKIES
+    return not name.startswith(TRACKING_COOKIE_PREFIXES)
+
+# Server-side session data (registered files, saved forms, job rows) not
+# written for this many seconds belongs to an expired session and is purged,
+# at startup and then every SESSION_PURGE_INTERVAL seconds
+SESSION_DATA_MAX_AGE = int(os.getenv('SESSION_DATA_MAX_AGE', 7 * 24 * 3600))
+SESSION_PURGE_INTERVAL = int(os.getenv('SESSION_PURGE_INTERVAL', '3600'))
+
+# Threads for running independent API calls of one request side by side
+API_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix='api')
+
 # Allowed file extensions for signatures
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Canvas signatures are base64-decoded in chunks of this many characters
+# (a multiple of 4), so the data URI is never copied or encoded whole
+BASE64_CHUNK_SIZE = 64 * 1024
+
+# Generated files are sent in reads of this many bytes when the WSGI server
+# can't sendfile() them (Werkzeug's default is 8 KiB)
+FILE_CHUNK_SIZE = int(os.getenv('FILE_CHUNK_SIZE', 1024 * 1024))
+
+# How long browsers may reuse a generated file without revalidating. File
+# names include the render key, so a URL never changes content.
+FILE_MAX_AGE = int(os.getenv('FILE_MAX_AGE', '86400'))
+
+# Downloads one user may have in flight at once; further ones get a 429
+USER_DOWNLOAD_LIMIT = int(os.getenv('USER_DOWNLOAD_LIMIT', '6'))
+
+# Signatures are embedded 2 inches wide, so they are stored at most 300 px
+# wide (150 DPI) as 16-colour palette PNGs
+SIGNATURE_MAX_WIDTH_PX = 300
+SIGNATURE_COLORS = 16
+
+def json_dumps(obj, indent=False, sort_keys=False):
+    """Serialize `obj` to UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None, sort_keys=sort_keys).encode('utf-8')
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(obj, status=200):
+    """JSON response encoded with json_dumps, for the app's JSON endpoints.
+    Flask's own provider is left alone: it also serializes the session
+    cookie, whose tagged types (tuples, bytes, Markup, datetimes) orjson
+    cannot round-trip, and formats dates as HTTP dates."""
+    return app.response_class(json_dumps(obj) + b'\n', status=status, mimetype='application/json')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# YYYY-MM-DD, with the same one-or-two digit month and day strptime accepts
+_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})', re.ASCII)
+
 def validate_date(date_str):
+    match = _DATE_RE.fullmatch(date_str)
+    if not match:
+        return False
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
+        datetime(*map(int, match.groups()))
         return True
     except ValueError:
         return False
 
+# Same entities as html.escape(quote=True), applied in a single pass
+_HTML_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})
+
 def sanitize_input(input_str):
     if not input_str:
         return ""
-    return escape(str(input_str).strip())
+    return str(input_str).strip().translate(_HTML_ESCAPE_TABLE)
+
+class TTLCache:
+    """Small thread-safe LRU mapping whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            item = self.data.pop(key, None)
+            return default if item is None else item[0]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+_sqlite_local = threading.local()
+
+def sqlite_connection(path):
+    """This thread's connection to the SQLite database at `path`, opened on
+    first use and kept, since every file lookup and status poll queries it.
+    Use it as a context manager to commit or roll back; don't close it."""
+    connections = _sqlite_local.__dict__.setdefault('connections', {})
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = sqlite3.connect(path, timeout=10)
+    return conn
+
+def add_column(conn, table, definition):
+    """Add a column to a table created by an older version of the app.
+    Returns False when the table already has it."""
+    try:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {definition}')
+        return True
+    except sqlite3.OperationalError as e:
+        if 'duplicate column' not in str(e):
+            raise
+        return False
+
+class FileRegistry:
+    """Files uploaded and generated by each session, by kind and name.
+
+    Kept in SQLite rather than in the session cookie, so the cookie stays
+    small however many agreements are generated, and every worker process
+    sees the same entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'owner TEXT NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL, '
+                'updated_at REAL NOT NULL DEFAULT 0, PRIMARY KEY (owner, kind, name))'
+            )
+            if add_column(conn, 'files', 'updated_at REAL NOT NULL DEFAULT 0'):
+                conn.execute('UPDATE files SET updated_at = ?', (time.time(),))
+
+    def _connect(self):
+        return sqlite_connection(self.path)
+
+    def add(self, owner, kind, name, path):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', (owner, kind, name, path, time.time()))
+
+    def get(self, owner, kind, name):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT path FROM files WHERE owner = ? AND kind = ? AND name = ?', (owner, kind, name)
+            ).fetchone()
+        return row[0] if row else None
+
+    def files(self, owner):
+        """(kind, name) of every file registered to `owner`."""
+        with self._connect() as conn:
+            return conn.execute('SELECT kind, name FROM files WHERE owner = ? ORDER BY kind, name', (owner,)).fetchall()
+
+    def clear(self, owner):
+        """Drop `owner`'s entries. Returns the paths among them that no other
+        session has registered."""
+        return self._delete('owner = ?', (owner,))
+
+    def purge(self, before):
+        """Drop entries last written before the `before` timestamp, left by
+        sessions that expired without logging out. Returns the paths no
+        remaining entry refers to."""
+        return self._delete('updated_at < ?', (before,))
+
+    def _delete(self, where, params):
+        with self._connect() as conn:
+            paths = [row[0] for row in conn.execute(f'SELECT DISTINCT path FROM files WHERE {where}', params)]
+            conn.execute(f'DELETE FROM files WHERE {where}', params)
+            return [path for path in paths if conn.execute('SELECT 1 FROM files WHERE path = ?', (path,)).fetchone() is None]
+
+FILE_REGISTRY = FileRegistry(app.config['FILE_REGISTRY_DB'])
+
+class FormDataStore:
+    """Last submitted agreement form of each session, kept next to the file
+    registry instead of in the session cookie, which is otherwise sent back
+    with every request, PDF viewer Range requests included."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS form_data ('
+                'owner TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL DEFAULT 0)'
+            )
+            if add_column(conn, 'form_data', 'updated_at REAL NOT NULL DEFAULT 0'):
+                conn.execute('UPDATE form_data SET updated_at = ?', (time.time(),))
+
+    def _connect(self):
+        return sqlite_connection(self.path)
+
+    def get(self, owner):
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM form_data WHERE owner = ?', (owner,)).fetchone()
+        return None if row is None else json_loads(row[0])
+
+    def set(self, owner, data):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO form_data VALUES (?, ?, ?)', (owner, json_dumps(data), time.time()))
+
+    def clear(self, owner):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM form_data WHERE owner = ?', (owner,))
+
+    def purge(self, before):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM form_data WHERE updated_at < ?', (before,))
+
+FORM_DATA = FormDataStore(app.config['FILE_REGISTRY_DB'])
+
+# Session keys that held each kind's {name: path} mapping before the registry;
+# sessions from before the move may still carry them
+_LEGACY_SESSION_KEYS = {'pdf': 'pdfs', 'docx': 'docxs', 'signature': 'signatures'}
+
+def session_id():
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+def registered_file(kind, name):
+    return FILE_REGISTRY.get(session_id(), kind, name) or session.get(_LEGACY_SESSION_KEYS[kind], {}).get(name)
+
+# (session, kind, name) -> (path, os.stat_result) of registered files that
+# exist, so repeated views and Range requests skip the registry and the stat
+FILE_STATS = TTLCache(maxsize=10_000, ttl=30)
+
+# Directory each kind of generated file lives in. Paths are rebuilt from it
+# with safe_join, as send_from_directory would, so a registry or session
+# entry can never point a download outside it.
+FILE_ROOTS = {'pdf': app.config['OUTPUT_DIR'], 'docx': app.config['DOCX_DIR']}
+
+def user_file(kind, name):
+    """Path and stat of a file registered to this session; the stat is None
+    when the file isn't registered or no longer exists."""
+    key = (session_id(), kind, name)
+    cached = FILE_STATS.get(key)
+    if cached is not None:
+        return cached
+    filepath = registered_file(kind, name)
+    if filepath and kind in FILE_ROOTS:
+        filepath = safe_join(FILE_ROOTS[kind], os.path.basename(filepath))
+    try:
+        cached = (filepath, os.stat(filepath))
+    except (TypeError, OSError):
+        return filepath, None
+    FILE_STATS.set(key, cached)
+    return cached
+
+def get_form_data(default=None):
+    data = FORM_DATA.get(session_id())
+    if data is None:
+        data = session.get('form_data', default)
+    return data
+
+def get_signature_path(filename):
+    return registered_file('signature', filename)
+
+# Background pool for file I/O that shouldn't hold up the request thread.
+# Signature bytes are written here; the request thread only creates the file.
+# Pending signature writes are tracked by file path until they finish so
+# readers can wait for them.
+FILE_WRITER = ThreadPoolExecutor(max_workers=8, thread_name_prefix='file-writer')
+SIGNATURE_WRITES = {}
+
+def shrink_signature(filepath):
+    """Downscale a signature to SIGNATURE_MAX_WIDTH_PX and re-save it as a
+    palette PNG. Left as uploaded when Pillow is missing or can't read it."""
+    if PILImage is None:
+        return
+    try:
+        with PILImage.open(filepath) as source:
+            image = source.convert('RGBA')
+        if image.width > SIGNATURE_MAX_WIDTH_PX:
+            height = max(1, round(image.height * SIGNATURE_MAX_WIDTH_PX / image.width))
+            image = image.resize((SIGNATURE_MAX_WIDTH_PX, height), PILImage.Resampling.LANCZOS)
+        image = image.quantize(colors=SIGNATURE_COLORS, method=PILImage.Quantize.FASTOCTREE)
+        image.save(filepath, format='PNG', optimize=True)
+    except Exception as e:
+        logger.error(f"Could not shrink signature {filepath}: {e}")
+
+def _write_signature(f, filepath, payload):
+    try:
+        with f:
+            f.write(payload)
+        shrink_signature(filepath)
+    except Exception as e:
+        logger.error(f"Error writing signature {filepath}: {e}")
+        if os.path.exists(filepath):
+            os.unlink(filepath)
+        raise
+
+def drop_page_cache(filepath):
+    """Flush `filepath` to disk and advise the kernel to evict its cached pages.
+
+    Used for throwaway artifacts that were read once, so they don't push hot
+    data out of the page cache. A no-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError as e:
+        logger.debug(f"Could not drop page cache for {filepath}: {e}")
+    finally:
+        os.close(fd)
+
+def open_for_streaming(filepath):
+    """Open `filepath` for a front-to-back read, advising the kernel to use
+    its larger sequential readahead and to start loading the file now."""
+    file = open(filepath, 'rb')
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError as e:
+            logger.debug(f"Could not advise readahead for {filepath}: {e}")
+    return file
+
+def wait_for_signature(filepath):
+    future = SIGNATURE_WRITES.get(filepath)
+    if future is not None:
+        future.result()
+
+# Signature images parsed by python-docx, by file path. Each upload is read and
+# its header parsed once, however many times it is rendered or hashed.
+SIGNATURE_IMAGES = TTLCache(maxsize=1_000, ttl=3600)
+
+def signature_image(filepath):
+    image = SIGNATURE_IMAGES.get(filepath)
+    if image is None:
+        wait_for_signature(filepath)
+        image = DocxImage.from_file(filepath)
+        SIGNATURE_IMAGES.set(filepath, image)
+    return image
+
+# Forward-slash form of SIGNATURE_DIR, computed once for building signature paths
+_SIG_DIR_POSIX = app.config['SIGNATURE_DIR'].replace('\\', '/').rstrip('/') + '/'
+
+def decode_data_uri(data):
+    """Base64-decode the payload of a data: URI into a BytesIO,
+    BASE64_CHUNK_SIZE characters at a time."""
+    buffer = BytesIO()
+    for start in range(data.find(',') + 1, len(data), BASE64_CHUNK_SIZE):
+        chunk = data[start:start + BASE64_CHUNK_SIZE].encode('ascii')
+        buffer.write(binascii.a2b_base64(chunk + b'=' * (-len(chunk) % 4)))
+    return buffer
 
 def save_signature(data, prefix, is_file=False):
     try:
-        filename = f"{prefix}_{uuid.uuid4().hex}.png"
-        filepath = os.path.join(app.config['SIGNATURE_DIR'], filename).replace('\\', '/')
+        filename = f"{prefix}_{secrets.token_hex(10)}.png"
+        filepath = _SIG_DIR_POSIX + filename
         logger.debug(f"Attempting to save signature to: {filepath}")
 
         if is_file:
             if not allowed_file(data.filename):
                 logger.error(f"Invalid file extension for {data.filename}")
                 return None
-            data.save(filepath)
+            buffer = BytesIO()
+            shutil.copyfileobj(data.stream, buffer, FILE_CHUNK_SIZE)
         else:
             if not data or not isinstance(data, str) or not data.startswith('data:image'):
                 logger.error("Invalid canvas signature: Data is empty or does not start with 'data:image'")
@@ -82,26 +566,63 @@ def save_signature(data, prefix, is_file=False):
                 logger.error("Invalid canvas signature: No comma found in data URI")
                 return None
             try:
-                img_data = base64.b64decode(data.split(',')[1])
-            except (base64.binascii.Error, IndexError) as e:
+                buffer = decode_data_uri(data)
+            except (UnicodeEncodeError, binascii.Error) as e:
                 logger.error(f"Invalid base64 data: {e}")
                 return None
-            with open(filepath, 'wb') as f:
-                f.write(img_data)
+
+        # Check the image here, so a bad upload is reported on the form; only
+        # writing it out (and shrinking it) happens in the background.
+        # getvalue() hands back the buffer's bytes without copying them.
+        payload = buffer.getvalue()
+        try:
+            DocxImage.from_blob(payload)
+            if PILImage is not None:
+                with PILImage.open(buffer) as image:
+                    image.verify()
+        except Exception as e:
+            logger.error(f"Invalid signature image: {e!r}")
+            return None
+
+        f = open(filepath, 'wb')
+        future = FILE_WRITER.submit(_write_signature, f, filepath, payload)
+        SIGNATURE_WRITES[filepath] = future
+        future.add_done_callback(lambda _: SIGNATURE_WRITES.pop(filepath, None))
 
         if not os.path.exists(filepath):
             logger.error(f"Signature file was not created: {filepath}")
             return None
 
-        logger.info(f"Saved signature to: {filepath}")
-        session.setdefault('signatures', {})
-        session['signatures'][filename] = filepath
-        session.modified = True
+        logger.info(f"Saving signature to: {filepath}")
+        FILE_REGISTRY.add(session_id(), 'signature', filename, filepath)
         return filename
     except Exception as e:
         logger.error(f"Error saving signature: {e}")
         return None
 
+def _write_parts(phys_writer, parts):
+    """Write each package part, streaming XML parts straight into their zip
+    entry with lxml's incremental writer instead of serializing the whole
+    tree to one bytes blob first. Binary parts (images) are written as-is."""
+    for part in parts:
+        if isinstance(part, XmlPart):
+            zinfo = ZipInfo(part.partname.membername, date_time=time.localtime(time.time())[:6])
+            zinfo.compress_type = ZIP_DEFLATED
+            zinfo.external_attr = 0o600 << 16
+            with phys_writer._zipf.open(zinfo, 'w') as stream, xmlfile(stream, encoding='UTF-8') as xf:
+                xf.write_declaration(standalone=True)
+                xf.write(part.element)
+        else:
+            phys_writer.write(part.partname, part.blob)
+        if len(part.rels):
+            phys_writer.write(part.partname.rels_uri, part.rels.xml)
+
+PackageWriter._write_parts = staticmethod(_write_parts)
+
+# Footer page-number fields, copied into each section
+_PAGE_FLD = parse_xml(f'<w:fldSimple {nsdecls("w")} w:instr="PAGE"/>')
+_NUMPAGES_FLD = parse_xml(f'<w:fldSimple {nsdecls("w")} w:instr="NUMPAGES"/>')
+
 def add_page_number(section):
     footer = section.footer
     footer_paragraph = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
@@ -109,499 +630,895 @@ def add_page_number(section):
     run = footer_paragraph.add_run()
     
     run.text = 'Page '
-    
-    fld_simple = OxmlElement('w:fldSimple')
-    fld_simple.set(qn('w:instr'), 'PAGE')
-    run._r.append(fld_simple)
+    run._r.append(copy.deepcopy(_PAGE_FLD))
     
     run = footer_paragraph.add_run()
     run.text = ' of '
-    
-    fld_simple = OxmlElement('w:fldSimple')
-    fld_simple.set(qn('w:instr'), 'NUMPAGES')
-    run._r.append(fld_simple)
+    run._r.append(copy.deepcopy(_NUMPAGES_FLD))
+
+# Part of every render_key. Bump it whenever the agreement text or layout
+# changes, so agreements rendered from the old template are not reused.
+TEMPLATE_VERSION = 1
+
+# Fields that vary per agreement: template token -> (content key, default)
+TEMPLATE_FIELDS = {
+    'company_name': ('name', 'Company Name'),
+    'start_date': ('start_date', 'Start Date'),
+    'location_headquarters': ('headquartersLocation', 'Location / Headquarters'),
+    'business_license_number': ('registrationNumber', 'Business License Number'),
+    'billing_address': ('billingAddress', 'Billing Address'),
+    'billing_contact_name': ('billing_contact_name', 'Billing Contact Name'),
+    'contact_person_designation': ('contact_person_designation', 'Contact person Designation'),
+    'contact_person_number': ('contact_person_number', 'Contact person number'),
+    'billing_email': ('billing_email', 'Billing Email'),
+}
+
+# Template placeholders, resolved in one pass over each run's text
+_TOKEN_RE = re.compile(r'\{\{(\w+)\}\}')
+
+# Content keys rendered into the agreement, besides the signature images
+RENDERED_FIELDS = [key for key, _ in TEMPLATE_FIELDS.values()] + ['contact_person_sign_date', 'chervic_date']
+
+# Paragraph properties for the kinds of paragraph in the agreement body
+PLAIN = ''
+JUSTIFIED = '<w:jc w:val="both"/>'
+HEADING_1_CENTERED = '<w:pStyle w:val="Heading1"/><w:jc w:val="center"/>'
+HEADING_2 = '<w:pStyle w:val="Heading2"/>'
+HEADING_3 = '<w:pStyle w:val="Heading3"/>'
+
+# Clauses of the agreement after the title page, as (paragraph properties,
+# text) pairs. Text may contain {{token}} placeholders and line breaks.
+MSA_CLAUSES = [
+    (JUSTIFIED, "THIS MASTER SERVICES AGREEMENT (the “Agreement”) is made and effective from {{start_date}} by & between:"),
+    (JUSTIFIED, "{{company_name}} is a company existing and operating in {{location_headquarters}}, having Business License Number {{business_license_number}}, with its place of business {{billing_address}}"),
+    (HEADING_1_CENTERED, "And"),
+    (JUSTIFIED, "Chervic Advisory Services Private Limited established under laws governing India, with its registered office at Unit No. 7, Sigma Soft Tech Park, Gamma Block, Ground Floor, Whitefield, Bangalore – 560066, Karnataka, India."),
+    (JUSTIFIED, "Chervic Advisory Services Private Limited and {{company_name}} hereinafter referred to individually as a “Party” and collectively as the “Parties”."),
+    (JUSTIFIED, "The Company and Service Provider are hereinafter individually referred to as a 'Party' and collectively as 'Parties'. Capitalized terms used but not defined herein shall have the meaning ascribed to such terms in the Agreement."),
+    (HEADING_2, "Definitions"),
+    (JUSTIFIED, "Under this Agreement:"),
+    (JUSTIFIED, "1) “Affiliate” shall mean, with respect to any entity, any other entity that owns or controls, is owned or controlled by, or is under common ownership or control with such entity. The Parties acknowledge that Service Provider’s Affiliate may provide Services to Company. In such event, Company and the Service Provider’s Affiliate shall execute a separate SOW for Services. Company’s Affiliates may also obtain Services from Service Provider or Service Provider’s Affiliate under the terms of this Agreement by executing a separate SOW for Services. Such SOW shall be governed by terms and conditions as specified in Part B of this Agreement."),
+    (JUSTIFIED, "2) “Resource” would mean any resource person employed by the Service Provider for the performance of its obligation under this Agreement."),
+    (JUSTIFIED, "3) “Party” would mean either the Company or the Service Provider."),
+    (HEADING_2, "1. Scope"),
+    (JUSTIFIED, "The Company shall engage the Service Provider for the provisions of certain services or deliverables (the “Services”) by issuance of statements of work under the terms of this Agreement (the “SOW”). The SOWs issued under this Agreement shall contain all relevant information such as the commercials, delivery date, scope of services etc."),
+    (HEADING_2, "2. Intellectual Property"),
+    (HEADING_3, "2.1 The Service Provider will:"),
+    (JUSTIFIED, "2.1.1 inform the Company of any matter which may come to its/Resource’s notice during the operation of this Agreement which may be of interest or importance or use to the Company; and"),
+    (JUSTIFIED, "2.1.2 communicate to the Company any proposals or suggestions occurring to it during the operation of this Agreement which may be of service for the business of the Company."),
+    (JUSTIFIED, "2.2 However, Service Provider shall retain all right, title and interest in and to the Service Provider’s pre-existing IP, including all right, title and interest in any modifications, customizations, updates, upgrades, enhancements, alterations, made thereto, whether at the request of Company or otherwise, and feedback related thereto."),
+    (JUSTIFIED, "2.3 Any intellectual property (IP) that the Service Provider creates in the course of performing work under this Agreement, including the Statement of Work (SOW) — such as trademarks, copyrights, designs, or any other creative assets — shall remain the sole and exclusive property of the Service Provider. Such IP shall not be considered “work for hire” for the Company. The Company shall not acquire any ownership rights over any IP created by the Service Provider, whether during or after the term of this Agreement, unless otherwise expressly Agreed in writing."),
+    (HEADING_2, "3. Confidential Information"),
+    (HEADING_3, "3.1 Definitions"),
+    (JUSTIFIED, "“Confidential Information” means any and all information of any kind whatsoever disclosed by one party (Disclosing Party) or any of its Representatives to the other party (Receiving Party) or any of its Representatives prior to, or after, the date of this Agreement in whatever form including, but not limited to, information or discussions related to any business opportunities and any other information which may reasonably be considered as confidential information in the normal course of business of the disclosing Party including but not limited to processes, strategies, data, know-how, trade secrets, designs, reports, test results, drawings, specifications, technical literature and other information or material whether in oral, written, graphic or electromagnetic form (and including without limitation any notes, information or analyses derived from such information however it is produced);"),
+    (JUSTIFIED, "“Representatives” means the directors, officers, employees and consultants of the Receiving Party and its associated companies together with any professional advisors of the Receiving Party which it consults in relation to pursuing business opportunities."),
+    (HEADING_3, "3.2 Obligations"),
+    (JUSTIFIED, "Confidential Information disclosed by the Disclosing Party to the Receiving Party shall be treated as confidential and safeguarded by the Receiving Party in accordance with this Agreement for a period of 3 years from the date of this Agreement. The Receiving Party agrees with and undertakes to the Disclosing Party that it shall and shall procure that its Representatives shall for a period of 3 years from the date of this Agreement:"),
+    (JUSTIFIED, "3.2.1 keep in strict confidence and in safe custody any Confidential Information disclosed to the Receiving Party by the Disclosing Party;"),
+    (JUSTIFIED, "3.2.2 not use or exploit any Confidential Information other than in connection with pursuing business opportunities;"),
+    (JUSTIFIED, "3.2.3 not copy or reproduce any or all of the Confidential Information except as is reasonably necessary in connection with the discussions on business opportunities;"),
+    (JUSTIFIED, "3.2.4 promptly comply with any reasonable directions of the Disclosing Party which are given for the protection of the security of the Confidential Information;"),
+    (JUSTIFIED, "3.2.5 except as may be required by any applicable law or regulation or the rules or requirements of any relevant stock exchange or relevant regulatory authority, not distribute, disclose or disseminate Confidential Information to anyone, except its Representatives who have a need to know such Confidential Information for the purpose of pursuing business opportunities; and"),
+    (JUSTIFIED, "3.2.6 inform each such Representative of the restrictions as to confidentiality, use and disclosure of such Confidential Information contained in this Agreement and, to the extent that each such Representative is not already under an appropriate duty of confidentiality, impose upon each such Representative obligations of confidentiality at least equivalent to those set out in this Agreement."),
+    (HEADING_3, "3.3 Public Statements"),
+    (JUSTIFIED, "Subject to Article 3.4.5 below, each Party hereby undertakes that it shall not (without the prior consent in writing of the other party) release any press statement or make any other announcement to any third party or make any public statement regarding the existence or content of this Agreement or the discussions contemplated by this Agreement or the identity of the Parties to such discussions."),
+    (HEADING_3, "3.4 Exceptions"),
+    (JUSTIFIED, "The provisions of this Article shall not apply to Confidential Information which the Receiving Party can show to the Disclosing Party's reasonable satisfaction:"),
+    (JUSTIFIED, "3.4.1 was known to the Receiving Party (without obligation to keep the same confidential) at the date of disclosure of the Confidential Information by the Disclosing Party;"),
+    (JUSTIFIED, "3.4.2 is after the date of disclosure acquired by the Receiving Party in good faith from an independent third party who is not subject to any obligation of confidentiality in respect of such Confidential Information;"),
+    (JUSTIFIED, "3.4.3 in its entirety was at the time of its disclosure in the public knowledge or has become public knowledge during the term of this Agreement otherwise than by reason of the Receiving Party's neglect or breach of the restrictions set out in this Agreement or any agreement between the parties;"),
+    (JUSTIFIED, "3.4.4 is independently developed by the Receiving Party without access to any or all of the Confidential Information; or"),
+    (JUSTIFIED, "3.4.5 is required by law, judicial action, the rules or regulations of a recognized stock exchange, government department or agency or other regulatory authority to be disclosed in which event the Receiving Party shall take all reasonable steps to consult and take into account the reasonable requirements of the Disclosing Party in relation to such disclosure."),
+    (JUSTIFIED, "3.5 Upon the earlier of (i) the expiration or termination of this Agreement, or (ii) written request by the Disclosing Party, the Receiving Party shall, at the Disclosing Party’s option, promptly return or destroy all Confidential Information, including all copies thereof, in its possession or in the possession of its Representatives, whether in written, graphic, electronic, or any other form capable of return or destruction"),
+    (JUSTIFIED, "Such return or destruction shall be completed within fifteen (15) days from the date of expiration, termination, or written request, as applicable. Upon completion, the Receiving Party shall, upon request, provide written certification confirming that all such Confidential Information has been returned or irretrievably destroyed."),
+    (HEADING_2, "4. Warranties"),
+    (JUSTIFIED, "Each Party represents and warrants to the other Party that:"),
+    (JUSTIFIED, "4.1 it has the legal capacity and has taken all necessary corporate action required to empower and authorise it to enter into this Agreement;"),
+    (JUSTIFIED, "4.2 this Agreement constitutes valid, binding obligations enforceable against it in accordance with the terms of this Agreement;"),
+    (JUSTIFIED, "4.3 all information provided by it to the other Party in relation to the provision and receipt of the Services under this Agreement is true to the best of its knowledge, information and belief;"),
+    (JUSTIFIED, "4.4 the execution of this Agreement and the performance of its obligations hereunder does not and shall not:"),
+    (JUSTIFIED, "4.4.1 contravene any applicable law;"),
+    (JUSTIFIED, "4.4.2 contravene any provision of the Party’s constitutional documents;"),
+    (JUSTIFIED, "4.4.3 conflict with, or constitute a breach of any of the provisions of any other agreement, obligation, restriction or undertaking which is binding on the Party; and"),
+    (JUSTIFIED, "4.4.4 no fact or circumstance exists that may impair its ability to comply with all of its obligations in terms of this Agreement;"),
+    (JUSTIFIED, "4.5 it is not insolvent or unable to pay its debts and has not stopped paying its debts as they fall due."),
+    (JUSTIFIED, "The warranties explicitly specified herein are in lieu of all other warranties of any kind, implied, statutory, or in any communication between them, including without limitation, the implied warranties of merchantability, non-infringement, title, and fitness for a particular purpose."),
+    (HEADING_2, "5. Commencement and Termination of Agreement"),
+    (HEADING_3, "5.1 Commencement"),
+    (JUSTIFIED, "When executed by both Parties, this Agreement comes into force on the date stated at the head of this Agreement (Effective Date)."),
+    (HEADING_3, "5.2 Termination"),
+    (JUSTIFIED, "This Agreement shall remain in effect from the date hereof until the earliest to occur of the following:"),
+    (JUSTIFIED, "5.2.1 Two (2) year from the (Effective Date) of this Agreement;"),
+    (JUSTIFIED, "5.2.2 If either Party becomes insolvent or bankrupt, or assigns all or a substantial part of its business or assets for the benefit of its creditor(s), or seized by Receivership or Regulatory Authority, or permits the appointment of a receiver or a receiver and manager for its business or assets, or becomes subject to any judicial, administrative, quasi-Judicial or any other legal proceedings relating to the bankruptcy, insolvency, reorganization or the protection of creditors rights or otherwise ceases to conduct business in the normal course."),
+    (JUSTIFIED, "5.2.3 Either Party may terminate this Agreement by providing the other Party with no less than thirty (30) days’ prior written notice of its intention to terminate. Such termination shall be effective only upon mutual written agreement of the Parties"),
+    (JUSTIFIED, "5.2.4 If the other Party is in default or commits a material breach of this Agreement (including failure to pay an undisputed amount due hereunder), provide that the aggrieved Party serves a 30-day written notice (a 'Rectification Notice') on the other Party and that Party fails to remedy the breach within that period."),
+    (JUSTIFIED, "5.2.5 Termination, completion or cancellation of the last remaining Proposal or Project that the Parties have agreed to pursue under this Agreement; or"),
+    (JUSTIFIED, "5.2.6 Either party can terminate this agreement by serving a 90-day notice to other party."),
+    (HEADING_2, "6. Non-Hire and Non-Solicitation"),
+    (JUSTIFIED, "Neither Party shall actively solicit any of each other’s employee, affiliate, associate, client or independent contractor during the term of the Proposal and for a period of two years following its expiry or earlier termination."),
+    (HEADING_2, "7. Limitation of Liability"),
+    (JUSTIFIED, "In no event shall the Company be liable for any damages, including but not limited to loss of profits, cost of cover, or other incidental, consequential, or indirect damages, even if the Company has been advised of the possibility of such damages. Similarly, the Service Provider’s liability shall be limited to fees received under this Agreement and shall not include any indirect, incidental, or consequential damages. The Service Provider shall make reasonable efforts to deliver the services in alignment with the timelines, quality standards, and specifications set forth in the applicable Statement of Work (SOW). However, delays or deviations caused by events beyond the Service Provider’s reasonable control (e.g., force majeure events, delays in client dependencies, etc.) shall not constitute a breach of contract and shall not be subject to penalties or termination"),
+    (JUSTIFIED, "Penalties for Non-Performance: In the event of a delay or failure in service delivery that is within the Service Provider’s control and is not remedied within ten (10) business days after written notice from the Company, the Service Provider shall be liable to pay a penalty of 0.5% of the total project value per week of delay, subject to a maximum cumulative penalty of 5% of the total project value"),
+    (HEADING_2, "8. Indemnity"),
+    (JUSTIFIED, "The Service Provider should indemnify and hold harmless the Company against any claims, damages, losses, or expenses arising from their negligence, misconduct, or breach of the Agreement."),
+    (JUSTIFIED, "Likewise, the Company shall indemnify and hold harmless the Service Provider (Chervic Advisory Services), its officers, employees, and affiliates from and against any claims, damages, losses, or expenses (including reasonable legal fees) arising out of or resulting from the Company’s (WMC’s) negligence, willful misconduct, or breach of this Agreement."),
+    (HEADING_2, "9. Security"),
+    (JUSTIFIED, "The Service Provider shall make reasonable efforts to comply with the security-related policies and procedures of the Company’s clients, provided that such policies and procedures are communicated to the Service Provider in writing and in advance. In cases where the client does not have a defined security policy, the Service Provider agrees to follow the Company’s relevant security protocols, to the extent such protocols are reasonable, applicable, and have been clearly communicated in writing prior to the commencement of services."),
+    (JUSTIFIED, "The Service Provider shall not be held responsible for non-compliance with any security policy that was not disclosed in writing or that imposes unreasonable or commercially impractical requirements. Any additional compliance obligations outside the scope of this Agreement shall be subject to mutual agreement and may require an amendment to the terms, including potential adjustments in timelines, scope, or fees"),
+    (HEADING_2, "10. Force Majeure"),
+    (HEADING_3, "10.1 General"),
+    (JUSTIFIED, "Neither Party will be liable for any delay in performing or for failing to perform their respective obligations to the extent that any such specific delay or failure is caused, directly or indirectly, by an event beyond the reasonable control of the either Party, as the case may be, including fire, flood, earthquake, pandemic, elements of nature, acts of war, terrorism, riots, civil disorders, rebellions or revolutions, change in government policies, strikes, lockouts or labour difficulties, such default or delay, collectively, a “Force Majeure Event”."),
+    (HEADING_3, "10.2 Notice and Suspension"),
+    (JUSTIFIED, "If, as a result of a Force Majeure Event, it becomes impossible or impractical for any Party to carry out its obligations hereunder in whole or in part, then such obligations shall be suspended to the extent necessary by such Force Majeure Event during its continuance and during such time such Party will not be considered in default or contractual breach provided that the affected Party delivers to the non-affected Party as force majeure Notice."),
+    (JUSTIFIED, "10.2.1 The Party affected by such Force Majeure Event (the “Affected Party”) shall give prompt written notice to the other Party (the “Non-Affected Party”) of the nature and probable duration of such Force Majeure Event, the extent of its effects on Affected Party’s performance hereunder, and the steps being taken by the Affected Party to address and remove the Force Majeure Event as soon as reasonably practicable following the onset of the Force Majeure Event (the “Force Majeure Notice”). If the Force Majeure Notice is not delivered within 5 (five) Business Days of the initial occurrence of the Force Majeure Event, then the Force Majeure Event will not be deemed to have occurred until the date on which the Non-Affected Party receives the Force Majeure Notice."),
+    (JUSTIFIED, "10.2.2 The provision of “Force Majeure” aforesaid shall not be construed as relieving or waiver to either Party from its obligation under this contract to the other Party to the extent of the performed as well as reasonable performable part."),
+    (JUSTIFIED, "10.2.3 In the event that a Force Majeure Event persists for a period exceeding 30 days, the Non – Affected Party may terminate this Agreement and any SOW issued hereunder forthwith with prior notice to the Affected Party."),
+    (JUSTIFIED, "10.2.4 Notwithstanding anything stated in this Agreement, a Force Majeure Event shall not affect the liability of the Company to make payments to the Service Provider for Services that have already been rendered by the Service Provider."),
+    (HEADING_2, "11. Independent Service Provider"),
+    (JUSTIFIED, "Service Provider will remain as an independent Service Provider in its relationship with Company. Nothing in this Agreement shall be deemed to have created a partnership, or joint venture or a contract of employment between Company and Service Provider."),
+    (HEADING_2, "12. Assignment"),
+    (JUSTIFIED, "The Parties shall not assign, sub-license, mortgage, lien, charge, encumber or otherwise dispose of or transfer this Agreement or any of its rights or obligations under this Agreement without the prior written consent of the other. If either party assigns this Agreement to any third parties, such party shall remain the primary obligor and shall be jointly or severally liable for the performance of its obligations under this Agreement."),
+    (HEADING_2, "13. No Waiver"),
+    (JUSTIFIED, "Failure or omission by either Party at any time to enforce or require strict or timely compliance with any provision of this Agreement will not affect or impair that provision, or the right of either Party to avail itself of the remedies it may have in respect of any breach of a provision, in any way. However, nothing agreed aforesaid will prevail over the governing laws."),
+    (HEADING_2, "14. Severability"),
+    (JUSTIFIED, "Any provision of this Agreement that is or becomes illegal, void or unenforceable will be ineffective to the extent only of such illegality, voidness or unenforceability and will not invalidate the remaining provisions."),
+    (HEADING_2, "15. Variation"),
+    (JUSTIFIED, "This Agreement may not be changed or modified in any way after it has been signed except in writing signed by or on behalf of all the Parties."),
+    (HEADING_2, "16. Governing Law and Dispute Resolution"),
+    (JUSTIFIED, "16.1 This Agreement shall be governed by, subject to and construed in accordance with the laws of India."),
+    (JUSTIFIED, "16.2 Both parties recognise that occasion may arise when one of the parties may have cause for concern relating to the way in which the other party is meeting its obligations under the terms of this Agreement."),
+    (JUSTIFIED, "16.3 The parties shall each be under a general obligation to use all reasonable endeavours to negotiate in good faith and to settle amicably any dispute of whatever nature arising in connection with this Agreement."),
+    (JUSTIFIED, "16.4 If a party considers that a dispute exists it shall notify the other party of the dispute in writing."),
+    (JUSTIFIED, "16.5 If after (30) calendar days from the date of raising a dispute notice, any party considers that, despite the good faith efforts of the parties, the dispute is not capable of being settled, the aggrieved party may refer the dispute to the competent court in India. The Indian courts, to the exclusion of all other courts, shall have the jurisdiction to finally settle such dispute."),
+    (HEADING_2, "17. Authority"),
+    (JUSTIFIED, "Each party hereto represents and warrants that the person executing this Agreement on its behalf has express authority to do so, and in so doing, binds the parties hereto."),
+    (HEADING_2, "18. Enforcement"),
+    (JUSTIFIED, "This Agreement is enforceable by the original parties to it and by their successors in title and permitted assignees."),
+    (HEADING_2, "19. Amendment and Extension"),
+    (JUSTIFIED, "This Agreement may be amended, and the Term of this Agreement may be extended prior to its expiry only by an instrument in writing signed by duly authorised representative/s of each of the Parties."),
+    (HEADING_2, "20. Survival"),
+    (JUSTIFIED, "The termination or expiry of this Agreement shall not affect the obligations of each Party with respect to the provisions as set forth in Articles 3 and 6."),
+    (HEADING_2, "21. Notices"),
+    (JUSTIFIED, "All notices hereunder shall be given in writing by hand delivery, courier service, or email at the addresses set forth below:"),
+    (HEADING_3, "If to {{company_name}}"),
+    (PLAIN, "{{billing_contact_name}} \n {{contact_person_designation}}  \n{{company_name}}  \n {{billing_address}} \n {{contact_person_number}}  \nE-mail:{{billing_email}}"),
+    (HEADING_3, "If to CHERVIC ADVISORY SERVICES PRIVATE LIMITED"),
+    (PLAIN, "Mr. Vasudevan  \nDirector  \nChervic Advisory Services Private Limited  \nUnit No.7 Sigma Soft Tech Park,  \nGamma Block, Ground Floor,  \nWhitefield, Bangalore – 560066,  \nKarnataka E-mail: accounts@chervic.in"),
+    (HEADING_2, "22. Entire Agreement and Modification"),
+    (JUSTIFIED, "22.1 This Agreement contains all terms, conditions and provisions hereof and the entire understandings and all representations of understandings and discussions of the Parties relating thereto. This Agreement supersedes and replaces any and all prior agreements and understandings between {{company_name}} and CHERVIC ADVISORY SERVICES PRIVATE LIMITED."),
+    (JUSTIFIED, "22.2 All terms and conditions included in this Agreement and its Schedule shall apply to any Project covered under this Agreement, unless mutually modified pursuant to the terms of a Project-Related Appendix."),
+    (HEADING_2, "IN WITNESS WHEREOF"),
+    (JUSTIFIED, "The Parties have caused this Agreement to be signed by their duly authorised representatives and effective the date written first above."),
+]
+
+def _run_text_xml(text):
+    """Return the w:r content python-docx writes for run text: tabs become
+    w:tab, line breaks w:br, and w:t keeps surrounding whitespace."""
+    parts = []
+    for piece in re.split(r'([\t\r\n])', text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            parts.append('<w:br/>')
+        elif piece:
+            space = ' xml:space="preserve"' if piece != piece.strip() else ''
+            parts.append(f'<w:t{space}>{escape(piece)}</w:t>')
+    return ''.join(parts)
+
+def _paragraph_xml(ppr, text):
+    """Return WordprocessingML for one paragraph, matching what python-docx
+    writes for add_paragraph(text)."""
+    ppr = f'<w:pPr>{ppr}</w:pPr>' if ppr else ''
+    return f'<w:p>{ppr}<w:r>{_run_text_xml(text)}</w:r></w:p>'
+
+# The whole clause body as one XML string, parsed once by _build_template
+MSA_BODY_XML = f'<w:body {nsdecls("w")}>' + ''.join(_paragraph_xml(ppr, text) for ppr, text in MSA_CLAUSES) + '</w:body>'
+
+def _build_template():
+    """Build the static MSA body once, with {{token}} placeholders for TEMPLATE_FIELDS."""
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Times New Roman'
+    style.font.size = Pt(12)
+
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+        add_page_number(section)
+
+    company_name = '{{company_name}}'
+
+    # Everything is inserted before a trailing sentinel paragraph, which is an
+    # O(1) addprevious rather than a scan of the body for sectPr on each add
+    tail = doc.add_paragraph()
+
+    heading = tail.insert_paragraph_before("Master Services Agreement", style='Heading 1')
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading.style.font.name = 'Times New Roman'
+    heading.runs[0].font.size = Pt(24)
+
+    subheading = tail.insert_paragraph_before("Between", style='Heading 2')
+    subheading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    subheading.runs[0].font.size = Pt(14)
+
+    heading = tail.insert_paragraph_before(f"{company_name}", style='Heading 3')
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading.runs[0].font.size = Pt(14)
+    heading.runs[0].bold = True
+
+    p = tail.insert_paragraph_before()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("And")
+    run.font.size = Pt(12)
+    run.bold = True
+
+    heading = tail.insert_paragraph_before("Chervic Advisory Services Private Limited", style='Heading 3')
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading.runs[0].font.size = Pt(14)
+    heading.runs[0].bold = True
+
+    tail.insert_paragraph_before().add_run().add_break(WD_BREAK.PAGE)
+
+    for p in list(parse_xml(MSA_BODY_XML)):
+        tail._p.addprevious(p)
+
+    tail._p.getparent().remove(tail._p)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+_TEMPLATE_BYTES = _build_template()
+
+# Parsed once; each agreement starts from a deep copy of this prototype, which
+# is only ever read, rather than re-parsing the template package. Don't touch
+# its proxies (doc.paragraphs etc.): python-docx caches some of them on the
+# document, and deepcopy would hand those to every copy still pointing at
+# detached XML.
+_TEMPLATE_DOCUMENT = Document(BytesIO(_TEMPLATE_BYTES))
+
+_template_probe = Document(BytesIO(_TEMPLATE_BYTES))
+
+# (paragraph index, run index, text) of every template run with placeholders
+_PLACEHOLDER_RUNS = [
+    (i, j, run.text)
+    for i, paragraph in enumerate(_template_probe.paragraphs)
+    for j, run in enumerate(paragraph.runs)
+    if '{{' in run.text
+]
+
+# Signature table column width in twips, half the text block as add_table
+# would use, and the drawing ids part.next_id would hand out for the two
+# signatures, so create_document doesn't re-scan the document for them.
+_section = _template_probe.sections[0]
+_SIGNATURE_COL_TWIPS = Emu((_section.page_width - _section.left_margin - _section.right_margin) // 2).twips
+_used_ids = {int(v) for v in _template_probe.element.xpath('//@id') if v.isdigit()}
+_SIGNATURE_SHAPE_IDS = [n for n in range(1, len(_used_ids) + 3) if n not in _used_ids][:2]
+del _template_probe, _section, _used_ids
+
+@lru_cache(maxsize=256)
+def _render_placeholders(values):
+    """Filled-in text of each _PLACEHOLDER_RUNS entry for one tuple of
+    TEMPLATE_FIELDS values. Cached, since an agreement is often re-submitted
+    with the same details while only the signatures change."""
+    fields = dict(zip(TEMPLATE_FIELDS, values))
+    fill = lambda m: fields[m.group(1)]
+    return tuple(_TOKEN_RE.sub(fill, text) for _, _, text in _PLACEHOLDER_RUNS)
+
+_SIGNATURE_TABLE_XML = (
+    f'<w:tbl {nsdecls("w")}>'
+    '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLayout w:type="autofit"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+    'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+    f'<w:tblGrid><w:gridCol w:w="{_SIGNATURE_COL_TWIPS}"/><w:gridCol w:w="{_SIGNATURE_COL_TWIPS}"/></w:tblGrid>'
+    '<w:tr>{}{}</w:tr></w:tbl>'
+)
+
+_SIGNATURE_CELL_XML = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{_SIGNATURE_COL_TWIPS}"/></w:tcPr>{{}}</w:tc>'
+
+_SIGNATURE_PICTURE_XML = (
+    f'<w:drawing><wp:inline {nsdecls("wp", "a", "pic", "r")}>'
+    '<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{id}" name="Picture {id}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture"><pic:pic>'
+    '<pic:nvPicPr><pic:cNvPr id="0" name="{filename}"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rId}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing>'
+)
+
+def signature_cell_xml(part, text, filepath, width, shape_id):
+    """WordprocessingML for one centered signature cell: the text, then the
+    cached signature image embedded in `part`, as run.add_picture would."""
+    image = signature_image(filepath)
+    image_parts = part.package.image_parts
+    image_part = image_parts._get_by_sha1(image.sha1) or image_parts._add_image_part(image)
+    rId = part.relate_to(image_part, RT.IMAGE)
+    cx, cy = image.scaled_dimensions(width, None)
+    picture = _SIGNATURE_PICTURE_XML.format(cx=cx, cy=cy, id=shape_id, filename=escape(image.filename, {'"': '&quot;'}), rId=rId)
+    paragraph = f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r>{_run_text_xml(text)}{picture}</w:r></w:p>'
+    return _SIGNATURE_CELL_XML.format(paragraph)
 
 def create_document(content):
     try:
-        doc = Document()
-        style = doc.styles['Normal']
-        style.font.name = 'Times New Roman'
-        style.font.size = Pt(12)
-
-        for section in doc.sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1)
-            section.right_margin = Inches(1)
-            add_page_number(section)
-
-        for sig_key in ['customer_signature', 'chervic_signature']:
-            if sig_key in content:
-                if not os.path.exists(content[sig_key]):
-                    logger.error(f"Signature file not found: {content[sig_key]}")
-                    raise FileNotFoundError(f"Signature file not found: {content[sig_key]}")
-
-        company_name = content.get('name', 'Company Name')
-        start_date = content.get('start_date', 'Start Date')
-        location_headquarters = content.get('headquartersLocation', 'Location / Headquarters')
-        business_license_number = content.get('registrationNumber', 'Business License Number')
-        billing_address = content.get('billingAddress', 'Billing Address')
-        billing_contact_name = content.get('billing_contact_name', 'Billing Contact Name')
-        contact_person_designation = content.get('contact_person_designation', 'Contact person Designation')
-        contact_person_number = content.get('contact_person_number', 'Contact person number')
+        # Missing signature files surface as FileNotFoundError from signature_cell_xml
+        sig_paths = {k: content[k] for k in ('customer_signature', 'chervic_signature') if k in content}
+
+        doc = copy.deepcopy(_TEMPLATE_DOCUMENT)
+        values = {token: str(content.get(key, default)) for token, (key, default) in TEMPLATE_FIELDS.items()}
+        paragraphs = doc.paragraphs
+        for (i, j, _), text in zip(_PLACEHOLDER_RUNS, _render_placeholders(tuple(values.values()))):
+            paragraphs[i].runs[j].text = text
+
+        company_name = values['company_name']
+        billing_contact_name = values['billing_contact_name']
+        contact_person_designation = values['contact_person_designation']
         contact_person_signature_date = content.get('contact_person_sign_date', 'Contact person Signature Date')
         cas_signature_date = content.get('chervic_date', 'CAS Signature Date')
-        billing_email = content.get('billing_email', 'Billing Email')
-
-        heading = doc.add_heading("Master Services Agreement", level=1)
-        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        heading.style.font.name = 'Times New Roman'
-        heading.runs[0].font.size = Pt(24)
-
-        subheading = doc.add_heading("Between", level=2)
-        subheading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        subheading.runs[0].font.size = Pt(14)
-
-        heading = doc.add_heading(f"{company_name}", level=3)
-        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        heading.runs[0].font.size = Pt(14)
-        heading.runs[0].bold = True
-
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = p.add_run("And")
-        run.font.size = Pt(12)
-        run.bold = True
-
-        heading = doc.add_heading("Chervic Advisory Services Private Limited", level=3)
-        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        heading.runs[0].font.size = Pt(14)
-        heading.runs[0].bold = True
-
-        doc.add_page_break()
-
-        p = doc.add_paragraph(f"THIS MASTER SERVICES AGREEMENT (the “Agreement”) is made and effective from {start_date} by & between:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph(f"{company_name} is a company existing and operating in {location_headquarters}, having Business License Number {business_license_number}, with its place of business {billing_address}")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("And")
-        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        p = doc.add_paragraph("Chervic Advisory Services Private Limited established under laws governing India, with its registered office at Unit No. 7, Sigma Soft Tech Park, Gamma Block, Ground Floor, Whitefield, Bangalore – 560066, Karnataka, India.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph(f"Chervic Advisory Services Private Limited and {company_name} hereinafter referred to individually as a “Party” and collectively as the “Parties”.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("The Company and Service Provider are hereinafter individually referred to as a 'Party' and collectively as 'Parties'. Capitalized terms used but not defined herein shall have the meaning ascribed to such terms in the Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("Definitions", level=2)
-
-        p = doc.add_paragraph("Under this Agreement:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("1) “Affiliate” shall mean, with respect to any entity, any other entity that owns or controls, is owned or controlled by, or is under common ownership or control with such entity. The Parties acknowledge that Service Provider’s Affiliate may provide Services to Company. In such event, Company and the Service Provider’s Affiliate shall execute a separate SOW for Services. Company’s Affiliates may also obtain Services from Service Provider or Service Provider’s Affiliate under the terms of this Agreement by executing a separate SOW for Services. Such SOW shall be governed by terms and conditions as specified in Part B of this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("2) “Resource” would mean any resource person employed by the Service Provider for the performance of its obligation under this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3) “Party” would mean either the Company or the Service Provider.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("1. Scope", level=2)
-
-        p = doc.add_paragraph("The Company shall engage the Service Provider for the provisions of certain services or deliverables (the “Services”) by issuance of statements of work under the terms of this Agreement (the “SOW”). The SOWs issued under this Agreement shall contain all relevant information such as the commercials, delivery date, scope of services etc.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("2. Intellectual Property", level=2)
-
-        heading = doc.add_heading("2.1 The Service Provider will:", level=3)
-
-        p = doc.add_paragraph("2.1.1 inform the Company of any matter which may come to its/Resource’s notice during the operation of this Agreement which may be of interest or importance or use to the Company; and")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("2.1.2 communicate to the Company any proposals or suggestions occurring to it during the operation of this Agreement which may be of service for the business of the Company.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("2.2 However, Service Provider shall retain all right, title and interest in and to the Service Provider’s pre-existing IP, including all right, title and interest in any modifications, customizations, updates, upgrades, enhancements, alterations, made thereto, whether at the request of Company or otherwise, and feedback related thereto.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("2.3 Any intellectual property (IP) that the Service Provider creates in the course of performing work under this Agreement, including the Statement of Work (SOW) — such as trademarks, copyrights, designs, or any other creative assets — shall remain the sole and exclusive property of the Service Provider. Such IP shall not be considered “work for hire” for the Company. The Company shall not acquire any ownership rights over any IP created by the Service Provider, whether during or after the term of this Agreement, unless otherwise expressly Agreed in writing.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("3. Confidential Information", level=2)
-
-        heading = doc.add_heading("3.1 Definitions", level=3)
-
-        p = doc.add_paragraph("“Confidential Information” means any and all information of any kind whatsoever disclosed by one party (Disclosing Party) or any of its Representatives to the other party (Receiving Party) or any of its Representatives prior to, or after, the date of this Agreement in whatever form including, but not limited to, information or discussions related to any business opportunities and any other information which may reasonably be considered as confidential information in the normal course of business of the disclosing Party including but not limited to processes, strategies, data, know-how, trade secrets, designs, reports, test results, drawings, specifications, technical literature and other information or material whether in oral, written, graphic or electromagnetic form (and including without limitation any notes, information or analyses derived from such information however it is produced);")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("“Representatives” means the directors, officers, employees and consultants of the Receiving Party and its associated companies together with any professional advisors of the Receiving Party which it consults in relation to pursuing business opportunities.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("3.2 Obligations", level=3)
-
-        p = doc.add_paragraph("Confidential Information disclosed by the Disclosing Party to the Receiving Party shall be treated as confidential and safeguarded by the Receiving Party in accordance with this Agreement for a period of 3 years from the date of this Agreement. The Receiving Party agrees with and undertakes to the Disclosing Party that it shall and shall procure that its Representatives shall for a period of 3 years from the date of this Agreement:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.1 keep in strict confidence and in safe custody any Confidential Information disclosed to the Receiving Party by the Disclosing Party;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.2 not use or exploit any Confidential Information other than in connection with pursuing business opportunities;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.3 not copy or reproduce any or all of the Confidential Information except as is reasonably necessary in connection with the discussions on business opportunities;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.4 promptly comply with any reasonable directions of the Disclosing Party which are given for the protection of the security of the Confidential Information;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.5 except as may be required by any applicable law or regulation or the rules or requirements of any relevant stock exchange or relevant regulatory authority, not distribute, disclose or disseminate Confidential Information to anyone, except its Representatives who have a need to know such Confidential Information for the purpose of pursuing business opportunities; and")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.2.6 inform each such Representative of the restrictions as to confidentiality, use and disclosure of such Confidential Information contained in this Agreement and, to the extent that each such Representative is not already under an appropriate duty of confidentiality, impose upon each such Representative obligations of confidentiality at least equivalent to those set out in this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("3.3 Public Statements", level=3)
-
-        p = doc.add_paragraph("Subject to Article 3.4.5 below, each Party hereby undertakes that it shall not (without the prior consent in writing of the other party) release any press statement or make any other announcement to any third party or make any public statement regarding the existence or content of this Agreement or the discussions contemplated by this Agreement or the identity of the Parties to such discussions.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("3.4 Exceptions", level=3)
-
-        p = doc.add_paragraph("The provisions of this Article shall not apply to Confidential Information which the Receiving Party can show to the Disclosing Party's reasonable satisfaction:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.4.1 was known to the Receiving Party (without obligation to keep the same confidential) at the date of disclosure of the Confidential Information by the Disclosing Party;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.4.2 is after the date of disclosure acquired by the Receiving Party in good faith from an independent third party who is not subject to any obligation of confidentiality in respect of such Confidential Information;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.4.3 in its entirety was at the time of its disclosure in the public knowledge or has become public knowledge during the term of this Agreement otherwise than by reason of the Receiving Party's neglect or breach of the restrictions set out in this Agreement or any agreement between the parties;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.4.4 is independently developed by the Receiving Party without access to any or all of the Confidential Information; or")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.4.5 is required by law, judicial action, the rules or regulations of a recognized stock exchange, government department or agency or other regulatory authority to be disclosed in which event the Receiving Party shall take all reasonable steps to consult and take into account the reasonable requirements of the Disclosing Party in relation to such disclosure.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("3.5 Upon the earlier of (i) the expiration or termination of this Agreement, or (ii) written request by the Disclosing Party, the Receiving Party shall, at the Disclosing Party’s option, promptly return or destroy all Confidential Information, including all copies thereof, in its possession or in the possession of its Representatives, whether in written, graphic, electronic, or any other form capable of return or destruction")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("Such return or destruction shall be completed within fifteen (15) days from the date of expiration, termination, or written request, as applicable. Upon completion, the Receiving Party shall, upon request, provide written certification confirming that all such Confidential Information has been returned or irretrievably destroyed.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("4. Warranties", level=2)
-
-        p = doc.add_paragraph("Each Party represents and warrants to the other Party that:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.1 it has the legal capacity and has taken all necessary corporate action required to empower and authorise it to enter into this Agreement;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.2 this Agreement constitutes valid, binding obligations enforceable against it in accordance with the terms of this Agreement;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.3 all information provided by it to the other Party in relation to the provision and receipt of the Services under this Agreement is true to the best of its knowledge, information and belief;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.4 the execution of this Agreement and the performance of its obligations hereunder does not and shall not:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.4.1 contravene any applicable law;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.4.2 contravene any provision of the Party’s constitutional documents;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.4.3 conflict with, or constitute a breach of any of the provisions of any other agreement, obligation, restriction or undertaking which is binding on the Party; and")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.4.4 no fact or circumstance exists that may impair its ability to comply with all of its obligations in terms of this Agreement;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("4.5 it is not insolvent or unable to pay its debts and has not stopped paying its debts as they fall due.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("The warranties explicitly specified herein are in lieu of all other warranties of any kind, implied, statutory, or in any communication between them, including without limitation, the implied warranties of merchantability, non-infringement, title, and fitness for a particular purpose.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("5. Commencement and Termination of Agreement", level=2)
-
-        heading = doc.add_heading("5.1 Commencement", level=3)
-
-        p = doc.add_paragraph("When executed by both Parties, this Agreement comes into force on the date stated at the head of this Agreement (Effective Date).")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("5.2 Termination", level=3)
-
-        p = doc.add_paragraph("This Agreement shall remain in effect from the date hereof until the earliest to occur of the following:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.1 Two (2) year from the (Effective Date) of this Agreement;")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.2 If either Party becomes insolvent or bankrupt, or assigns all or a substantial part of its business or assets for the benefit of its creditor(s), or seized by Receivership or Regulatory Authority, or permits the appointment of a receiver or a receiver and manager for its business or assets, or becomes subject to any judicial, administrative, quasi-Judicial or any other legal proceedings relating to the bankruptcy, insolvency, reorganization or the protection of creditors rights or otherwise ceases to conduct business in the normal course.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.3 Either Party may terminate this Agreement by providing the other Party with no less than thirty (30) days’ prior written notice of its intention to terminate. Such termination shall be effective only upon mutual written agreement of the Parties")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.4 If the other Party is in default or commits a material breach of this Agreement (including failure to pay an undisputed amount due hereunder), provide that the aggrieved Party serves a 30-day written notice (a 'Rectification Notice') on the other Party and that Party fails to remedy the breach within that period.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.5 Termination, completion or cancellation of the last remaining Proposal or Project that the Parties have agreed to pursue under this Agreement; or")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("5.2.6 Either party can terminate this agreement by serving a 90-day notice to other party.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("6. Non-Hire and Non-Solicitation", level=2)
-
-        p = doc.add_paragraph("Neither Party shall actively solicit any of each other’s employee, affiliate, associate, client or independent contractor during the term of the Proposal and for a period of two years following its expiry or earlier termination.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("7. Limitation of Liability", level=2)
-
-        p = doc.add_paragraph("In no event shall the Company be liable for any damages, including but not limited to loss of profits, cost of cover, or other incidental, consequential, or indirect damages, even if the Company has been advised of the possibility of such damages. Similarly, the Service Provider’s liability shall be limited to fees received under this Agreement and shall not include any indirect, incidental, or consequential damages. The Service Provider shall make reasonable efforts to deliver the services in alignment with the timelines, quality standards, and specifications set forth in the applicable Statement of Work (SOW). However, delays or deviations caused by events beyond the Service Provider’s reasonable control (e.g., force majeure events, delays in client dependencies, etc.) shall not constitute a breach of contract and shall not be subject to penalties or termination")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("Penalties for Non-Performance: In the event of a delay or failure in service delivery that is within the Service Provider’s control and is not remedied within ten (10) business days after written notice from the Company, the Service Provider shall be liable to pay a penalty of 0.5% of the total project value per week of delay, subject to a maximum cumulative penalty of 5% of the total project value")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("8. Indemnity", level=2)
-
-        p = doc.add_paragraph("The Service Provider should indemnify and hold harmless the Company against any claims, damages, losses, or expenses arising from their negligence, misconduct, or breach of the Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("Likewise, the Company shall indemnify and hold harmless the Service Provider (Chervic Advisory Services), its officers, employees, and affiliates from and against any claims, damages, losses, or expenses (including reasonable legal fees) arising out of or resulting from the Company’s (WMC’s) negligence, willful misconduct, or breach of this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("9. Security", level=2)
-
-        p = doc.add_paragraph("The Service Provider shall make reasonable efforts to comply with the security-related policies and procedures of the Company’s clients, provided that such policies and procedures are communicated to the Service Provider in writing and in advance. In cases where the client does not have a defined security policy, the Service Provider agrees to follow the Company’s relevant security protocols, to the extent such protocols are reasonable, applicable, and have been clearly communicated in writing prior to the commencement of services.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("The Service Provider shall not be held responsible for non-compliance with any security policy that was not disclosed in writing or that imposes unreasonable or commercially impractical requirements. Any additional compliance obligations outside the scope of this Agreement shall be subject to mutual agreement and may require an amendment to the terms, including potential adjustments in timelines, scope, or fees")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("10. Force Majeure", level=2)
-
-        heading = doc.add_heading("10.1 General", level=3)
-
-        p = doc.add_paragraph("Neither Party will be liable for any delay in performing or for failing to perform their respective obligations to the extent that any such specific delay or failure is caused, directly or indirectly, by an event beyond the reasonable control of the either Party, as the case may be, including fire, flood, earthquake, pandemic, elements of nature, acts of war, terrorism, riots, civil disorders, rebellions or revolutions, change in government policies, strikes, lockouts or labour difficulties, such default or delay, collectively, a “Force Majeure Event”.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("10.2 Notice and Suspension", level=3)
-
-        p = doc.add_paragraph("If, as a result of a Force Majeure Event, it becomes impossible or impractical for any Party to carry out its obligations hereunder in whole or in part, then such obligations shall be suspended to the extent necessary by such Force Majeure Event during its continuance and during such time such Party will not be considered in default or contractual breach provided that the affected Party delivers to the non-affected Party as force majeure Notice.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("10.2.1 The Party affected by such Force Majeure Event (the “Affected Party”) shall give prompt written notice to the other Party (the “Non-Affected Party”) of the nature and probable duration of such Force Majeure Event, the extent of its effects on Affected Party’s performance hereunder, and the steps being taken by the Affected Party to address and remove the Force Majeure Event as soon as reasonably practicable following the onset of the Force Majeure Event (the “Force Majeure Notice”). If the Force Majeure Notice is not delivered within 5 (five) Business Days of the initial occurrence of the Force Majeure Event, then the Force Majeure Event will not be deemed to have occurred until the date on which the Non-Affected Party receives the Force Majeure Notice.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("10.2.2 The provision of “Force Majeure” aforesaid shall not be construed as relieving or waiver to either Party from its obligation under this contract to the other Party to the extent of the performed as well as reasonable performable part.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("10.2.3 In the event that a Force Majeure Event persists for a period exceeding 30 days, the Non – Affected Party may terminate this Agreement and any SOW issued hereunder forthwith with prior notice to the Affected Party.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("10.2.4 Notwithstanding anything stated in this Agreement, a Force Majeure Event shall not affect the liability of the Company to make payments to the Service Provider for Services that have already been rendered by the Service Provider.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("11. Independent Service Provider", level=2)
-
-        p = doc.add_paragraph("Service Provider will remain as an independent Service Provider in its relationship with Company. Nothing in this Agreement shall be deemed to have created a partnership, or joint venture or a contract of employment between Company and Service Provider.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("12. Assignment", level=2)
-
-        p = doc.add_paragraph("The Parties shall not assign, sub-license, mortgage, lien, charge, encumber or otherwise dispose of or transfer this Agreement or any of its rights or obligations under this Agreement without the prior written consent of the other. If either party assigns this Agreement to any third parties, such party shall remain the primary obligor and shall be jointly or severally liable for the performance of its obligations under this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("13. No Waiver", level=2)
-
-        p = doc.add_paragraph("Failure or omission by either Party at any time to enforce or require strict or timely compliance with any provision of this Agreement will not affect or impair that provision, or the right of either Party to avail itself of the remedies it may have in respect of any breach of a provision, in any way. However, nothing agreed aforesaid will prevail over the governing laws.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("14. Severability", level=2)
-
-        p = doc.add_paragraph("Any provision of this Agreement that is or becomes illegal, void or unenforceable will be ineffective to the extent only of such illegality, voidness or unenforceability and will not invalidate the remaining provisions.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("15. Variation", level=2)
-
-        p = doc.add_paragraph("This Agreement may not be changed or modified in any way after it has been signed except in writing signed by or on behalf of all the Parties.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("16. Governing Law and Dispute Resolution", level=2)
-
-        p = doc.add_paragraph("16.1 This Agreement shall be governed by, subject to and construed in accordance with the laws of India.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("16.2 Both parties recognise that occasion may arise when one of the parties may have cause for concern relating to the way in which the other party is meeting its obligations under the terms of this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("16.3 The parties shall each be under a general obligation to use all reasonable endeavours to negotiate in good faith and to settle amicably any dispute of whatever nature arising in connection with this Agreement.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("16.4 If a party considers that a dispute exists it shall notify the other party of the dispute in writing.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("16.5 If after (30) calendar days from the date of raising a dispute notice, any party considers that, despite the good faith efforts of the parties, the dispute is not capable of being settled, the aggrieved party may refer the dispute to the competent court in India. The Indian courts, to the exclusion of all other courts, shall have the jurisdiction to finally settle such dispute.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("17. Authority", level=2)
-
-        p = doc.add_paragraph("Each party hereto represents and warrants that the person executing this Agreement on its behalf has express authority to do so, and in so doing, binds the parties hereto.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("18. Enforcement", level=2)
-
-        p = doc.add_paragraph("This Agreement is enforceable by the original parties to it and by their successors in title and permitted assignees.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("19. Amendment and Extension", level=2)
-
-        p = doc.add_paragraph("This Agreement may be amended, and the Term of this Agreement may be extended prior to its expiry only by an instrument in writing signed by duly authorised representative/s of each of the Parties.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
-        heading = doc.add_heading("20. Survival", level=2)
-
-        p = doc.add_paragraph("The termination or expiry of this Agreement shall not affect the obligations of each Party with respect to the provisions as set forth in Articles 3 and 6.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("21. Notices", level=2)
-
-        p = doc.add_paragraph("All notices hereunder shall be given in writing by hand delivery, courier service, or email at the addresses set forth below:")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading(f"If to {company_name}", level=3)
-
-        p = doc.add_paragraph(f"{billing_contact_name} \n {contact_person_designation}  \n{company_name}  \n {billing_address} \n {contact_person_number}  \nE-mail:{billing_email}")
-
-        heading = doc.add_heading("If to CHERVIC ADVISORY SERVICES PRIVATE LIMITED", level=3)
-
-        p = doc.add_paragraph("Mr. Vasudevan  \nDirector  \nChervic Advisory Services Private Limited  \nUnit No.7 Sigma Soft Tech Park,  \nGamma Block, Ground Floor,  \nWhitefield, Bangalore – 560066,  \nKarnataka E-mail: accounts@chervic.in")
-
-        heading = doc.add_heading("22. Entire Agreement and Modification", level=2)
-
-        p = doc.add_paragraph(f"22.1 This Agreement contains all terms, conditions and provisions hereof and the entire understandings and all representations of understandings and discussions of the Parties relating thereto. This Agreement supersedes and replaces any and all prior agreements and understandings between {company_name} and CHERVIC ADVISORY SERVICES PRIVATE LIMITED.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        p = doc.add_paragraph("22.2 All terms and conditions included in this Agreement and its Schedule shall apply to any Project covered under this Agreement, unless mutually modified pursuant to the terms of a Project-Related Appendix.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        heading = doc.add_heading("IN WITNESS WHEREOF", level=2)
-
-        p = doc.add_paragraph("The Parties have caused this Agreement to be signed by their duly authorised representatives and effective the date written first above.")
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-
-        if content.get('customer_signature') or content.get('chervic_signature'):
-            table = doc.add_table(rows=1, cols=2)
-            table.autofit = True
-            table.style = 'Table Grid'
-
-            if content.get('customer_signature'):
-                cell = table.cell(0, 0)
-                paragraph = cell.paragraphs[0]
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                run = paragraph.add_run(f"{company_name}\n{billing_contact_name}\nDesignation: {contact_person_designation}\nDate {contact_person_signature_date}")
-                run.add_picture(content['customer_signature'], width=Inches(2))
-
-            if content.get('chervic_signature'):
-                cell = table.cell(0, 1)
-                paragraph = cell.paragraphs[0]
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                run = paragraph.add_run(f"CHERVIC ADVISORY SERVICES PRIVATE LIMITED\nMr. Vasudevan\nDesignation: Director \nDate: {cas_signature_date}")
-                run.add_picture(content['chervic_signature'], width=Inches(2))
+        signatures = [
+            ('customer_signature', f"{company_name}\n{billing_contact_name}\nDesignation: {contact_person_designation}\nDate {contact_person_signature_date}"),
+            ('chervic_signature', f"CHERVIC ADVISORY SERVICES PRIVATE LIMITED\nMr. Vasudevan\nDesignation: Director \nDate: {cas_signature_date}"),
+        ]
+        if any(content.get(key) for key, _ in signatures):
+            # The whole table is built as one XML string and parsed once
+            shape_ids = iter(_SIGNATURE_SHAPE_IDS)
+            cells = [
+                signature_cell_xml(doc.part, text, sig_paths[key], Inches(2), next(shape_ids))
+                if content.get(key) else _SIGNATURE_CELL_XML.format('<w:p/>')
+                for key, text in signatures
+            ]
+            doc.element.body._insert_tbl(parse_xml(_SIGNATURE_TABLE_XML.format(*cells)))
 
         buffer = BytesIO()
         doc.save(buffer)
         buffer.seek(0)
         logger.info("Successfully created document buffer")
         return buffer
+    except FileNotFoundError as e:
+        logger.error(f"Signature file not found: {e.filename}")
+        raise FileNotFoundError(f"Signature file not found: {e.filename}")
     except Exception as e:
         logger.error(f"Error in create_document: {str(e)}")
         raise
 
-def generate_pdf(content):
-    doc_buffer = create_document(content)
-    filename = f"MSA_{content['name'].replace(' ', '_')}_{uuid.uuid4().hex}.docx"
-    docx_filepath = os.path.join(app.config['DOCX_DIR'], filename).replace('\\', '/')
-    pdf_filename = filename.replace('.docx', '.pdf')
-    pdf_filepath = os.path.join(app.config['OUTPUT_DIR'], pdf_filename).replace('\\', '/')
-
-    try:
-        with open(docx_filepath, 'wb') as f:
-            f.write(doc_buffer.getvalue())
-        logger.info(f"Saved DOCX file: {docx_filepath}")
-
-        try:
+def _uno_property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+class SofficeWorker:
+    """One LibreOffice instance with its own user profile.
+
+    With the UNO bridge available the instance is a long-running headless
+    server that conversions are sent to over a socket. Without it, each
+    conversion is a one-shot soffice run that still uses this worker's
+    private profile, so parallel runs never fight over the same profile.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.port = SOFFICE_BASE_PORT + index
+        self.profile_url = Path(app.config['SOFFICE_PROFILE_DIR'], f"profile{index}").resolve().as_uri()
+        self.process = None
+        self.context = None
+        self.desktop = None
+        self.jobs = 0
+
+    def start(self):
+        self.jobs = 0
+        if uno is None:
+            return
+        self.process = subprocess.Popen(
+            [
+                LIBREOFFICE_PATH,
+                f"-env:UserInstallation={self.profile_url}",
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--nodefault",
+                "--norestore",
+                "--nofirststartwizard",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + SOFFICE_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext")
+                break
+            except NoConnectException:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise Exception(f"LibreOffice worker {self.index} did not start on port {self.port}")
+                time.sleep(0.25)
+        self.context = context
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        logger.info(f"Started LibreOffice worker {self.index} on port {self.port}")
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+            self.context = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+    def is_alive(self):
+        return uno is None or (self.process is not None and self.process.poll() is None)
+
+    def convert(self, docx_filepaths, outdir, sources=None):
+        """Convert a batch of DOCX files into `outdir`.
+
+        `sources` optionally maps DOCX paths to their bytes, which the UNO
+        path loads straight from memory instead of reading the file back.
+        Returns a dict mapping each DOCX path to its PDF path, or to the
+        exception that conversion raised when the document could not be
+        converted on its own.
+        """
+        self.jobs += len(docx_filepaths)
+        results = {
+            docx_filepath: os.path.join(outdir, os.path.splitext(os.path.basename(docx_filepath))[0] + '.pdf')
+            for docx_filepath in docx_filepaths
+        }
+        if uno is None:
             result = subprocess.run(
                 [
                     LIBREOFFICE_PATH,
+                    f"-env:UserInstallation={self.profile_url}",
                     "--headless",
                     "--convert-to", "pdf",
-                    "--outdir", app.config['OUTPUT_DIR'],
-                    docx_filepath
+                    "--outdir", outdir,
+                    *docx_filepaths
                 ],
                 capture_output=True,
                 text=True,
-                check=True
+                check=True,
+                timeout=SOFFICE_TIMEOUT
             )
             logger.info(f"LibreOffice conversion output: {result.stdout}")
-            if not os.path.exists(pdf_filepath):
-                raise Exception(f"PDF file was not generated at {pdf_filepath}")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"LibreOffice conversion failed: stdout={e.stdout}, stderr={e.stderr}")
-            raise Exception(f"PDF conversion failed: stdout={e.stdout}, stderr={e.stderr}")
+            return results
+        for docx_filepath, pdf_filepath in results.items():
+            try:
+                source = (sources or {}).get(docx_filepath)
+                if source is not None:
+                    stream = self.context.ServiceManager.createInstanceWithArgumentsAndContext(
+                        "com.sun.star.io.SequenceInputStream", (uno.ByteSequence(source),), self.context
+                    )
+                    url = "private:stream"
+                    load_properties = (_uno_property("Hidden", True), _uno_property("InputStream", stream))
+                else:
+                    url = Path(docx_filepath).resolve().as_uri()
+                    load_properties = (_uno_property("Hidden", True),)
+                document = self.desktop.loadComponentFromURL(url, "_blank", 0, load_properties)
+                try:
+                    document.storeToURL(
+                        Path(pdf_filepath).resolve().as_uri(), (_uno_property("FilterName", "writer_pdf_Export"),)
+                    )
+                finally:
+                    document.close(True)
+                logger.info(f"LibreOffice worker {self.index} converted {docx_filepath}")
+            except Exception as e:
+                logger.error(f"LibreOffice worker {self.index} failed to convert {docx_filepath}: {e}")
+                results[docx_filepath] = e
+        return results
+
+class SofficePool:
+    """Bounded pool of SofficeWorkers.
+
+    Workers are checked out from the idle queue for one conversion at a
+    time. Crashed, failed and worn-out (SOFFICE_MAX_JOBS) workers go to the
+    supervisor thread, which restarts them before returning them to the pool.
+    """
+
+    def __init__(self, size, first_index=0):
+        self.workers = [SofficeWorker(index) for index in range(first_index, first_index + size)]
+        self.idle = queue.Queue()
+        self.maintenance = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            for worker in self.workers:
+                self.maintenance.put(worker)
+            threading.Thread(target=self._supervise, name='soffice-supervisor', daemon=True).start()
+            atexit.register(self.shutdown)
+            self.started = True
+
+    def _supervise(self):
+        while True:
+            worker = self.maintenance.get()
+            if worker is None:
+                return
+            try:
+                worker.stop()
+                worker.start()
+                self.idle.put(worker)
+            except Exception as e:
+                logger.error(f"Error restarting LibreOffice worker {worker.index}: {e}")
+                worker.stop()
+                time.sleep(1)
+                self.maintenance.put(worker)
+
+    def convert(self, docx_filepaths, outdir, sources=None):
+        self.start()
+        try:
+            worker = self.idle.get(timeout=SOFFICE_TIMEOUT)
+        except queue.Empty:
+            raise Exception("No LibreOffice worker became available")
+        healthy = False
+        try:
+            if not worker.is_alive():
+                raise Exception(f"LibreOffice worker {worker.index} is not running")
+            results = worker.convert(docx_filepaths, outdir, sources)
+            healthy = worker.is_alive()
+            return results
+        finally:
+            if healthy and worker.jobs < SOFFICE_MAX_JOBS:
+                self.idle.put(worker)
+            else:
+                self.maintenance.put(worker)
+
+    def shutdown(self):
+        self.maintenance.put(None)
+        for worker in self.workers:
+            worker.stop()
+
+SOFFICE_POOL = SofficePool(SOFFICE_POOL_SIZE, SOFFICE_FIRST_INDEX)
+if SOFFICE_PRESTART:
+    SOFFICE_POOL.start()
+
+class PdfBatcher:
+    """Coalesces concurrent PDF conversions into batched pool runs.
+
+    Requests arriving within PDF_BATCH_WINDOW_MS of each other (up to
+    PDF_BATCH_SIZE of them) are converted by a single soffice invocation, so
+    LibreOffice startup is paid once per batch instead of once per document.
+    Batches are dispatched concurrently, one per pool worker.
+    """
+
+    def __init__(self, pool, batch_size, window):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self.pending = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=len(pool.workers), thread_name_prefix='pdf-batch')
+        self.lock = threading.Lock()
+        self.started = False
+
+    def submit(self, docx_filepath, outdir, source=None):
+        with self.lock:
+            if not self.started:
+                threading.Thread(target=self._collect, name='pdf-batcher', daemon=True).start()
+                self.started = True
+        future = Future()
+        self.pending.put((docx_filepath, outdir, source, future))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            by_outdir = {}
+            for docx_filepath, outdir, source, future in batch:
+                by_outdir.setdefault(outdir, []).append((docx_filepath, source, future))
+            for outdir, items in by_outdir.items():
+                self.executor.submit(self._convert, items, outdir)
+
+    def _convert(self, items, outdir):
+        docx_filepaths = [docx_filepath for docx_filepath, _, _ in items]
+        sources = {docx_filepath: source for docx_filepath, source, _ in items if source is not None}
+        try:
+            results = self.pool.convert(docx_filepaths, outdir, sources)
+            error = None
+        except Exception as e:
+            results = {
+                docx_filepath: os.path.join(outdir, os.path.splitext(os.path.basename(docx_filepath))[0] + '.pdf')
+                for docx_filepath in docx_filepaths
+            }
+            error = e
+        for docx_filepath, _, future in items:
+            result = results[docx_filepath]
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif os.path.exists(result):
+                future.set_result(result)
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_exception(Exception(f"PDF file was not generated at {result}"))
+
+PDF_BATCHER = PdfBatcher(SOFFICE_POOL, PDF_BATCH_SIZE, PDF_BATCH_WINDOW_MS / 1000)
+
+def render_key(content):
+    """Hash everything that ends up in the rendered agreement.
+
+    Signatures are hashed by content (the SHA-1 python-docx keeps for the
+    image) rather than path, since every upload gets a fresh filename.
+    """
+    fields = {key: content.get(key) for key in RENDERED_FIELDS}
+    digest = hashlib.blake2b(json_dumps(fields, sort_keys=True), digest_size=16)
+    digest.update(f"template-v{TEMPLATE_VERSION}".encode('utf-8'))
+    for sig_key in ['customer_signature', 'chervic_signature']:
+        if content.get(sig_key):
+            digest.update(sig_key.encode('utf-8'))
+            digest.update(signature_image(content[sig_key]).sha1.encode('ascii'))
+    return digest.hexdigest()
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        # Copy under a temporary name, so readers of `dst` never see it half written
+        tmp = f"{dst}.{secrets.token_hex(4)}.tmp"
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+def restore_from_pdf_cache(key, docx_filepath, pdf_filepath):
+    """Link a cached rendering of `key` into place. Returns False on a miss."""
+    cached_docx = os.path.join(app.config['PDF_CACHE_DIR'], f"{key}.docx")
+    cached_pdf = os.path.join(app.config['PDF_CACHE_DIR'], f"{key}.pdf")
+    try:
+        link_or_copy(cached_docx, docx_filepath)
+        link_or_copy(cached_pdf, pdf_filepath)
+        os.utime(cached_pdf)
+        return True
+    except OSError:
+        return False
+
+def store_in_pdf_cache(key, docx_filepath, pdf_filepath):
+    cache_dir = app.config['PDF_CACHE_DIR']
+    try:
+        link_or_copy(docx_filepath, os.path.join(cache_dir, f"{key}.docx"))
+        link_or_copy(pdf_filepath, os.path.join(cache_dir, f"{key}.pdf"))
+        # Entries may vanish or be half gone meanwhile (a logout removes the
+        # files only its session used), so keep pruning past missing files
+        cached = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith('.pdf'):
+                try:
+                    cached.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        cached.sort()
+        remove_files(
+            path
+            for _, pdf_path in cached[:max(0, len(cached) - PDF_CACHE_SIZE)]
+            for path in (pdf_path, pdf_path[:-4] + '.docx')
+        )
+    except OSError as e:
+        logger.error(f"Error updating PDF cache for {key}: {e}")
+
+def generate_pdf(content):
+    # Files are named by render_key, so an agreement that was already rendered
+    # with the same fields and signatures is served from disk as-is, or linked
+    # in from PDF_CACHE_DIR when another session rendered it
+    key = render_key(content)
+    stem = f"MSA_{content['name'].replace(' ', '_')}_{key}"
+    filename = f"{stem}.docx"
+    docx_filepath = os.path.join(app.config['DOCX_DIR'], filename).replace('\\', '/')
+    pdf_filename = f"{stem}.pdf"
+    pdf_filepath = os.path.join(app.config['OUTPUT_DIR'], pdf_filename).replace('\\', '/')
+
+    if os.path.exists(pdf_filepath) and os.path.exists(docx_filepath):
+        logger.info(f"Reusing rendered PDF: {pdf_filepath}")
+    elif restore_from_pdf_cache(key, docx_filepath, pdf_filepath):
+        logger.info(f"Reusing cached PDF for render key {key}")
+    else:
+        # Identical submissions share the final paths, so render under a name
+        # of our own and move both files into place once the PDF exists. The
+        # final paths are never truncated or unlinked while another job or
+        # session may be using them.
+        tmp_stem = f"{stem}.{secrets.token_hex(4)}"
+        tmp_docx_filepath = os.path.join(app.config['DOCX_DIR'], f"{tmp_stem}.docx").replace('\\', '/')
+        tmp_pdf_filepath = os.path.join(app.config['OUTPUT_DIR'], f"{tmp_stem}.pdf").replace('\\', '/')
+        try:
+            docx_bytes = create_document(content).getvalue()
+            with open(tmp_docx_filepath, 'wb') as f:
+                f.write(docx_bytes)
+            logger.info(f"Saved DOCX file: {tmp_docx_filepath}")
+
+            try:
+                # The DOCX is still kept on disk for downloads, but the UNO
+                # workers convert it from these bytes rather than re-reading it
+                PDF_BATCHER.submit(tmp_docx_filepath, app.config['OUTPUT_DIR'], docx_bytes).result(timeout=SOFFICE_TIMEOUT)
+                if not os.path.exists(tmp_pdf_filepath):
+                    raise Exception(f"PDF file was not generated at {tmp_pdf_filepath}")
+            except subprocess.CalledProcessError as e:
+                logger.error(f"LibreOffice conversion failed: stdout={e.stdout}, stderr={e.stderr}")
+                raise Exception(f"PDF conversion failed: stdout={e.stdout}, stderr={e.stderr}")
+            except Exception as e:
+                logger.error(f"Unexpected error during PDF conversion: {str(e)}")
+                raise
+
+            os.replace(tmp_docx_filepath, docx_filepath)
+            os.replace(tmp_pdf_filepath, pdf_filepath)
         except Exception as e:
-            logger.error(f"Unexpected error during PDF conversion: {str(e)}")
+            logger.error(f"Error generating PDF: {e}")
+            for path in (tmp_docx_filepath, tmp_pdf_filepath):
+                if os.path.exists(path):
+                    os.unlink(path)
             raise
 
-        session.setdefault('pdfs', {})
-        session.setdefault('docxs', {})
-        session['pdfs'][pdf_filename] = pdf_filepath
-        session['docxs'][pdf_filename] = docx_filepath
-        session.modified = True
+        # The DOCX is only needed again for a download
+        FILE_WRITER.submit(drop_page_cache, docx_filepath)
+        FILE_WRITER.submit(store_in_pdf_cache, key, docx_filepath, pdf_filepath)
 
-        with open(pdf_filepath, 'rb') as f:
-            pdf_buffer = BytesIO(f.read())
+    return key, pdf_filename, pdf_filepath, docx_filepath
 
-        return pdf_filename, pdf_buffer
-    except Exception as e:
-        logger.error(f"Error generating PDF: {e}")
-        if os.path.exists(docx_filepath):
-            os.unlink(docx_filepath)
-        if os.path.exists(pdf_filepath):
-            os.unlink(pdf_filepath)
-        raise
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error removing {path}: {e}")
 
 def save_edit_history(pdf_filename, username, changes):
-    history_file = os.path.join(app.config['EDIT_HISTORY_DIR'], f"{pdf_filename}_history.json").replace('\\', '/')
+    history_file = os.path.join(app.config['EDIT_HISTORY_DIR'], f"{pdf_filename}_history.jsonl").replace('\\', '/')
     history_entry = {
         'timestamp': datetime.now().isoformat(),
         'username': username,
         'changes': changes
     }
     try:
-        history = []
-        if os.path.exists(history_file):
-            with open(history_file, 'r') as f:
-                history = json.load(f)
-        history.append(history_entry)
-        with open(history_file, 'w') as f:
-            json.dump(history, f, indent=2)
+        # JSON Lines: one entry per line, appended without reading the file back
+        with open(history_file, 'ab') as f:
+            f.write(json_dumps(history_entry) + b'\n')
         logger.info(f"Saved edit history to: {history_file}")
+        return history_file
     except Exception as e:
         logger.error(f"Error saving edit history: {e}")
+        return None
+
+class PdfJobStore:
+    """State of background agreement generations, shared by all workers.
+
+    A job is 'pending' until generation finishes, then 'done' with the PDF
+    filename or 'failed' with the error message. A job still pending after
+    PDF_JOB_TIMEOUT is reported as failed. Finished rows stay, so reloading
+    the status page gives the same answer, until logout or until
+    purge_expired_sessions drops them after SESSION_DATA_MAX_AGE.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pdf_jobs ('
+                'id TEXT PRIMARY KEY, owner TEXT NOT NULL, state TEXT NOT NULL, pdf_filename TEXT, error TEXT, '
+                'created_at REAL NOT NULL DEFAULT 0, updated_at REAL NOT NULL DEFAULT 0)'
+            )
+            add_column(conn, 'pdf_jobs', 'created_at REAL NOT NULL DEFAULT 0')
+            if add_column(conn, 'pdf_jobs', 'updated_at REAL NOT NULL DEFAULT 0'):
+                conn.execute('UPDATE pdf_jobs SET updated_at = ?', (time.time(),))
+
+    def _connect(self):
+        return sqlite_connection(self.path)
+
+    def create(self, job_id, owner):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pdf_jobs (id, owner, state, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                (job_id, owner, time.time(), time.time())
+            )
+
+    def finish(self, job_id, pdf_filename=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE pdf_jobs SET state = ?, pdf_filename = ?, error = ?, updated_at = ? WHERE id = ?',
+                ('failed' if error else 'done', pdf_filename, error, time.time(), job_id)
+            )
+
+    def exists(self, job_id):
+        with self._connect() as conn:
+            return conn.execute('SELECT 1 FROM pdf_jobs WHERE id = ?', (job_id,)).fetchone() is not None
+
+    def get(self, job_id, owner):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT state, pdf_filename, error, created_at FROM pdf_jobs WHERE id = ? AND owner = ?', (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return None
+            state, pdf_filename, error, created_at = row
+            if state == 'pending' and created_at < time.time() - PDF_JOB_TIMEOUT:
+                state, error = 'failed', "Generation did not finish. Please submit the form again."
+                conn.execute(
+                    "UPDATE pdf_jobs SET state = ?, error = ? WHERE id = ? AND state = 'pending'", (state, error, job_id)
+                )
+        return {'state': state, 'pdf_filename': pdf_filename, 'error': error}
+
+    def clear(self, owner):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM pdf_jobs WHERE owner = ?', (owner,))
+
+    def purge(self, before):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM pdf_jobs WHERE updated_at < ?', (before,))
+
+PDF_JOB_STORE = PdfJobStore(app.config['FILE_REGISTRY_DB'])
+
+def purge_expired_sessions():
+    """Drop registry, form and job rows not written for SESSION_DATA_MAX_AGE,
+    along with the files only those rows referred to. Most sessions simply
+    expire instead of logging out, so nothing else would clean them up."""
+    before = time.time() - SESSION_DATA_MAX_AGE
+    try:
+        remove_files(FILE_REGISTRY.purge(before))
+        FORM_DATA.purge(before)
+        PDF_JOB_STORE.purge(before)
+    except Exception as e:
+        logger.error(f"Error purging expired session data: {e}")
+
+def _purge_expired_sessions_periodically():
+    while True:
+        time.sleep(SESSION_PURGE_INTERVAL)
+        purge_expired_sessions()
+
+purge_expired_sessions()
+threading.Thread(target=_purge_expired_sessions_periodically, name='session-purge', daemon=True).start()
+
+def run_pdf_job(job_id, content, sid, username, changes):
+    try:
+        key, pdf_filename, pdf_filepath, docx_filepath = generate_pdf(content)
+        # Logout drops the session's jobs and files; don't register new ones
+        # under a session that no longer exists
+        if not PDF_JOB_STORE.exists(job_id):
+            logger.info(f"Session logged out during job {job_id}; not registering {pdf_filename}")
+            return
+        # The DOCX is the conversion source, so both files are on disk before
+        # either is registered; downloads never have to wait for one
+        FILE_REGISTRY.add(sid, 'pdf', pdf_filename, pdf_filepath)
+        FILE_REGISTRY.add(sid, 'docx', pdf_filename, docx_filepath)
+        for ext in ('pdf', 'docx'):
+            FILE_REGISTRY.add(sid, 'cache', f"{key}.{ext}", os.path.join(app.config['PDF_CACHE_DIR'], f"{key}.{ext}"))
+        history_file = save_edit_history(pdf_filename, username, changes)
+        if history_file:
+            FILE_REGISTRY.add(sid, 'history', os.path.basename(history_file), history_file)
+        PDF_JOB_STORE.finish(job_id, pdf_filename=pdf_filename)
+    except Exception as e:
+        logger.error(f"Error generating Agreement: {e}")
+        PDF_JOB_STORE.finish(job_id, error=str(e))
+    finally:
+        # python-docx documents are full of reference cycles (parts <-> package),
+        # so collect them now rather than letting lxml trees pile up until the
+        # next automatic full collection. They are still in the young
+        # generations here, so there is no need to walk the whole heap.
+        gc.collect(1)
 
 class AuthenticationError(Exception):
     pass
@@ -610,11 +1527,10 @@ def login_user(username, password):
     logger.debug(f"Starting login for username: {username}")
     try:
         url = f"{BASE_URL}/auth/login"
-        headers = {'Content-Type': 'application/json'}
         data = {'username': username, 'password': password}
-        response = requests.post(url, json=data, headers=headers)
+        response = API_SESSION.post(url, json=data, timeout=10)
         response.raise_for_status()
-        result = response.json()
+        result = json_loads(response.content)
         user_info = fetch_user_info(response.cookies)
         user_role = user_info.get('userRole')
         if user_role != 'BUSINESS_DEVELOPMENT_USER':
@@ -630,7 +1546,7 @@ def login_user(username, password):
             'username': user_data.get('username', username),
             'role': user_role
         }
-        session['cookies'] = {c.name: c.value for c in response.cookies}
+        session['cookies'] = {c.name: c.value for c in response.cookies if is_auth_cookie(c.name)}
         session.modified = True
         logger.info(f"Login successful for {username} with user_id: {user_id}, role: {user_role}")
         return result
@@ -642,20 +1558,18 @@ def fetch_user_info(login_cookies=None):
     logger.debug("Fetching user info")
     try:
         url = f"{BASE_URL}/auth/role"
-        headers = {'Content-Type': 'application/json'}
-        with requests.session() as s:
-            if login_cookies:
-                s.cookies.update(login_cookies)
-            elif 'cookies' in session:
-                s.cookies.update(session['cookies'])
-            else:
-                logger.error("No cookies available for fetch_user_info")
-                raise AuthenticationError("No authentication cookies available")
-            response = s.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            user_info = response.json()
-            logger.debug(f"User info response: {json.dumps(user_info, indent=2)}")
-            return user_info
+        if login_cookies:
+            cookies = login_cookies
+        elif 'cookies' in session:
+            cookies = session['cookies']
+        else:
+            logger.error("No cookies available for fetch_user_info")
+            raise AuthenticationError("No authentication cookies available")
+        response = API_SESSION.get(url, cookies=cookies, timeout=10)
+        response.raise_for_status()
+        user_info = json_loads(response.content)
+        logger.debug(f"User info response: {json_dumps(user_info, indent=True).decode('utf-8')}")
+        return user_info
     except requests.RequestException as e:
         logger.error(f"Error fetching user info: {e}")
         raise AuthenticationError(f"Failed to fetch user info: {str(e)}")
@@ -664,75 +1578,84 @@ def fetch_domain_data_by_ariba(ariba_network_id):
     logger.debug(f"Fetching domain data for Ariba Network ID: {ariba_network_id}")
     try:
         url = f"{BASE_URL}/domain?index=0&limit=10&aribaNetworkId={ariba_network_id}"
-        headers = {'Content-Type': 'application/json'}
-        with requests.session() as s:
-            if 'cookies' in session:
-                s.cookies.update(session['cookies'])
-            else:
-                logger.error("No cookies available for fetch_domain_data_by_ariba")
-                raise AuthenticationError("No authentication cookies available")
-            response = s.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            domain_list = response.json()
-            if not domain_list or not isinstance(domain_list, list) or len(domain_list) == 0:
-                logger.warning(f"No domains found for Ariba Network ID: {ariba_network_id}")
-                return None
-            domain_id = domain_list[0].get('id')
-            if not domain_id:
-                logger.error(f"No domain ID found in response for Ariba Network ID: {ariba_network_id}")
-                return None
-            url = f"{BASE_URL}/domain/{domain_id}"
-            response = s.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            domain_data = response.json()
-            logger.info(f"Successfully fetched domain data for domain ID: {domain_id}")
-            return domain_data
+        if 'cookies' in session:
+            cookies = session['cookies']
+        else:
+            logger.error("No cookies available for fetch_domain_data_by_ariba")
+            raise AuthenticationError("No authentication cookies available")
+        response = API_SESSION.get(url, cookies=cookies, timeout=10)
+        response.raise_for_status()
+        domain_list = json_loads(response.content)
+        if not domain_list or not isinstance(domain_list, list) or len(domain_list) == 0:
+            logger.warning(f"No domains found for Ariba Network ID: {ariba_network_id}")
+            return None
+        domain_id = domain_list[0].get('id')
+        if not domain_id:
+            logger.error(f"No domain ID found in response for Ariba Network ID: {ariba_network_id}")
+            return None
+        url = f"{BASE_URL}/domain/{domain_id}"
+        response = API_SESSION.get(url, cookies=cookies, timeout=10)
+        response.raise_for_status()
+        domain_data = json_loads(response.content)
+        logger.info(f"Successfully fetched domain data for domain ID: {domain_id}")
+        return domain_data
     except requests.RequestException as e:
         logger.error(f"Error fetching domain data for Ariba Network ID {ariba_network_id}: {e}")
         flash(f"Error fetching domain data: {str(e)}", "error")
         return None
 
-def fetch_ariba_network_ids(user_id):
+def fetch_ariba_network_ids(user_id, cookies):
+    """Returns (ariba_network_ids, error message or None). Runs on the API
+    pool, so it takes the session's cookies as an argument and leaves
+    flashing the error to the request thread."""
     logger.debug(f"Fetching Ariba Network IDs for user_id: {user_id}")
     try:
         url = f"{BASE_URL}/domain?index=0&limit=100"
-        headers = {'Content-Type': 'application/json'}
-        with requests.session() as s:
-            if 'cookies' in session:
-                s.cookies.update(session['cookies'])
-            else:
-                logger.error("No cookies available for fetch_ariba_network_ids")
-                raise AuthenticationError("No authentication cookies available")
-            response = s.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            domains = response.json()
-            ariba_network_ids = [domain.get('aribaNetworkId') for domain in domains if domain.get('aribaNetworkId')]
-            logger.info(f"Fetched {len(ariba_network_ids)} Ariba Network IDs")
-            return ariba_network_ids
+        if cookies is None:
+            logger.error("No cookies available for fetch_ariba_network_ids")
+            raise AuthenticationError("No authentication cookies available")
+        response = API_SESSION.get(url, cookies=cookies, timeout=10)
+        response.raise_for_status()
+        domains = json_loads(response.content)
+        ariba_network_ids = [domain.get('aribaNetworkId') for domain in domains if domain.get('aribaNetworkId')]
+        logger.info(f"Fetched {len(ariba_network_ids)} Ariba Network IDs")
+        return ariba_network_ids, None
     except requests.RequestException as e:
         logger.error(f"Error fetching Ariba Network IDs: {e}")
-        flash(f"Error fetching Ariba Network IDs: {str(e)}", "error")
-        return []
+        return [], f"Error fetching Ariba Network IDs: {str(e)}"
+
+# Generated files, the SQLite registry and the per-process path caches are
+# local to one host, so with several hosts nginx pins each browser to one of
+# them by hashing this cookie (see deploy/nginx.conf). It is a random token
+# rather than the session cookie, whose value changes whenever the session
+# does.
+ROUTE_COOKIE = os.getenv('ROUTE_COOKIE', 'msa_route')
+
+@app.after_request
+def set_route_cookie(response):
+    if ROUTE_COOKIE and ROUTE_COOKIE not in request.cookies:
+        response.set_cookie(ROUTE_COOKIE, uuid.uuid4().hex, httponly=True, samesite='Lax')
+    return response
 
 @app.route('/fetch_domain_data', methods=['POST'])
 def fetch_domain_data():
     if 'user' not in session:
-        return jsonify({'success': False, 'error': 'Not logged in'}), 401
+        return json_response({'success': False, 'error': 'Not logged in'}, 401)
     data = request.get_json()
     ariba_network_id = data.get('aribaNetworkId')
     if not ariba_network_id:
-        return jsonify({'success': False, 'error': 'Ariba Network ID is required'}), 400
+        return json_response({'success': False, 'error': 'Ariba Network ID is required'}, 400)
     try:
         domain_data = fetch_domain_data_by_ariba(ariba_network_id)
         if domain_data:
             session['aribaNetworkId'] = ariba_network_id
             session.modified = True
-            return jsonify({'success': True, 'domain_data': domain_data})
+            return json_response({'success': True, 'domain_data': domain_data})
         else:
-            return jsonify({'success': False, 'error': 'No domain data found'}), 404
+            return json_response({'success': False, 'error': 'No domain data found'}, 404)
     except Exception as e:
         logger.error(f"Error fetching domain data: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return json_response({'success': False, 'error': str(e)}, 500)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -750,56 +1673,13 @@ def login():
 
 @app.route('/logout')
 def logout():
-    for filename in session.get('pdfs', {}):
-        filepath = session['pdfs'][filename]
-        if os.path.exists(filepath):
-            try:
-                os.unlink(filepath)
-                logger.info(f"Deleted PDF file: {filepath}")
-            except Exception as e:
-                logger.error(f"Error deleting PDF file {filepath}: {e}")
-
-    for filename in session.get('docxs', {}):
-        filepath = session['docxs'][filename]
-        if os.path.exists(filepath):
-            try:
-                os.unlink(filepath)
-                logger.info(f"Deleted DOCX file: {filepath}")
-            except Exception as e:
-                logger.error(f"Error deleting DOCX file {filepath}: {e}")
-
-    for filename in session.get('signatures', {}):
-        filepath = session['signatures'][filename]
-        if os.path.exists(filepath):
-            try:
-                os.unlink(filepath)
-                logger.info(f"Deleted signature file: {filepath}")
-            except Exception as e:
-                logger.error(f"Error deleting signature file {filepath}: {e}")
-
-    for filename in session.get('edit_history', {}):
-        history_file = os.path.join(app.config['EDIT_HISTORY_DIR'], f"{filename}_history.json").replace('\\', '/')
-        if os.path.exists(history_file):
-            try:
-                os.unlink(history_file)
-                logger.info(f"Deleted edit history file: {history_file}")
-            except Exception as e:
-                logger.error(f"Error deleting edit history file {history_file}: {e}")
-
-    directories = [
-        app.config['DOCX_DIR'],
-        app.config['OUTPUT_DIR'],
-        app.config['SIGNATURE_DIR'],
-        app.config['EDIT_HISTORY_DIR']
-    ]
-    for directory in directories:
-        if os.path.exists(directory):
-            try:
-                shutil.rmtree(directory)
-                logger.info(f"Deleted directory: {directory}")
-            except Exception as e:
-                logger.error(f"Error deleting directory {directory}: {e}")
-
+    # The file directories are shared by every session, and agreements are
+    # shared by render key, so only remove the files (signatures, agreements,
+    # edit history, cached copies) that no other session has registered
+    remove_files(FILE_REGISTRY.clear(session_id()))
+    FILE_STATS.clear()
+    PDF_JOB_STORE.clear(session_id())
+    FORM_DATA.clear(session_id())
     session.clear()
     flash("Logged out successfully.", "success")
     return redirect(url_for('login'))
@@ -808,7 +1688,7 @@ def logout():
 def index():
     if 'user' not in session:
         return redirect(url_for('login'))
-    data = session.get('form_data', {
+    data = get_form_data({
         "name": "",
         "websiteUrl": "",
         "registrationNumber": "",
@@ -832,10 +1712,19 @@ def index():
             logger.error("No user_id found in session")
             flash("User ID not found. Please log in again.", "error")
             return redirect(url_for('login'))
-        ariba_network_ids = fetch_ariba_network_ids(user_id)
         selected_ariba_id = session.get('aribaNetworkId', '')
+        # The two lookups are independent: list the IDs on the API pool while
+        # this thread fetches the selected domain
+        ids_future = API_EXECUTOR.submit(fetch_ariba_network_ids, user_id, session.get('cookies'))
+        try:
+            api_data = fetch_domain_data_by_ariba(selected_ariba_id) if selected_ariba_id else None
+        finally:
+            # Wait even when the lookup above failed, so the worker never
+            # outlives the request
+            ariba_network_ids, ids_error = ids_future.result()
+        if ids_error:
+            flash(ids_error, "error")
         if selected_ariba_id:
-            api_data = fetch_domain_data_by_ariba(selected_ariba_id)
             if api_data:
                 api_field_mapping = {
                     "name": "name",
@@ -853,8 +1742,7 @@ def index():
             else:
                 logger.warning(f"No domain data found for Ariba Network ID: {selected_ariba_id}")
                 flash(f"No domain data found for Ariba Network ID: {selected_ariba_id}. Please enter manually.", "warning")
-        session['form_data'] = data
-        session.modified = True
+        FORM_DATA.set(session_id(), data)
         return render_template('index.html', data=data, ariba_network_ids=ariba_network_ids, selected_ariba_id=selected_ariba_id)
     except Exception as e:
         logger.error(f"Error in index route: {e}")
@@ -866,7 +1754,7 @@ def generate_nda():
     if 'user' not in session:
         flash("Please log in to continue.", "error")
         return redirect(url_for('login'))
-    data = session.get('form_data', {})
+    data = get_form_data({})
     required_fields = [
         "name", "websiteUrl", "registrationNumber", "headquartersLocation",
         "countriesOfOperation", "businessType", "industryType", "billingAddress",
@@ -897,14 +1785,14 @@ def generate_nda():
     if chervic_signature_data and chervic_signature_data.startswith('data:image'):
         signature_filename = save_signature(chervic_signature_data, 'chervic', is_file=False)
         if signature_filename:
-            data['chervic_signature'] = session['signatures'][signature_filename]
+            data['chervic_signature'] = get_signature_path(signature_filename)
         else:
             flash("Failed to process Chervic canvas signature.", "error")
             return render_template('index.html', data=data)
     elif chervic_signature_file and allowed_file(chervic_signature_file.filename):
         signature_filename = save_signature(chervic_signature_file, 'chervic', is_file=True)
         if signature_filename:
-            data['chervic_signature'] = session['signatures'][signature_filename]
+            data['chervic_signature'] = get_signature_path(signature_filename)
         else:
             flash("Failed to process Chervic file signature.", "error")
             return render_template('index.html', data=data)
@@ -916,123 +1804,377 @@ def generate_nda():
     if customer_signature_data and customer_signature_data.startswith('data:image'):
         signature_filename = save_signature(customer_signature_data, 'customer', is_file=False)
         if signature_filename:
-            data['customer_signature'] = session['signatures'][signature_filename]
+            data['customer_signature'] = get_signature_path(signature_filename)
         else:
             flash("Failed to process Customer canvas signature.", "error")
             return render_template('index.html', data=data)
     elif customer_signature_file and allowed_file(customer_signature_file.filename):
         signature_filename = save_signature(customer_signature_file, 'customer', is_file=True)
         if signature_filename:
-            data['customer_signature'] = session['signatures'][signature_filename]
+            data['customer_signature'] = get_signature_path(signature_filename)
         else:
             flash("Failed to process Customer file signature.", "error")
             return render_template('index.html', data=data)
     else:
         flash("Customer signature is required.", "error")
         return render_template('index.html', data=data)
-    session['form_data'] = data
-    session.modified = True
-    try:
-        pdf_filename, pdf_buffer = generate_pdf(data)
-        username = session['user']['username']
-        changes = {
-            'fields_updated': {k: v for k, v in data.items() if k in required_fields + optional_fields},
-            'signatures_added': {
-                'chervic': bool(data.get('chervic_signature')),
-                'customer': bool(data.get('customer_signature'))
-            }
+    FORM_DATA.set(session_id(), data)
+    changes = {
+        'fields_updated': {k: v for k, v in data.items() if k in required_fields + optional_fields},
+        'signatures_added': {
+            'chervic': bool(data.get('chervic_signature')),
+            'customer': bool(data.get('customer_signature'))
         }
-        save_edit_history(pdf_filename, username, changes)
-        flash("Agreement generated successfully!", "success")
-        return redirect(url_for('view_pdf', filename=pdf_filename))
-    except Exception as e:
-        logger.error(f"Error generating Agreement: {e}")
-        flash(f"Error generating Agreement: {str(e)}", "error")
-        return render_template('index.html', data=data)
-
-@app.route('/download_pdf/<filename>')
-def download_pdf(filename):
+    }
+    # Generation runs in the background; the browser waits on the status page
+    job_id = uuid.uuid4().hex
+    sid = session_id()
+    PDF_JOB_STORE.create(job_id, sid)
+    PDF_JOBS.submit(run_pdf_job, job_id, data, sid, session['user']['username'], changes)
+    return redirect(url_for('job_status', job_id=job_id))
+
+# Loaded once; the status page is polled every second while a job runs
+STATUS_TEMPLATE = app.jinja_env.get_template('status.html')
+
+@app.route('/status/<job_id>')
+def job_status(job_id):
     if 'user' not in session:
-        flash("Please log in to access PDFs.", "error")
+        flash("Please log in to continue.", "error")
         return redirect(url_for('login'))
-    filepath = session.get('pdfs', {}).get(filename)
-    if not filepath or not os.path.exists(filepath):
-        flash("PDF not found.", "error")
-        logger.error(f"PDF not found for download: {filepath}")
+    job = PDF_JOB_STORE.get(job_id, session_id())
+    if job is None:
+        flash("Agreement not found. Please submit the form again.", "error")
         return redirect(url_for('index'))
-    try:
-        return send_file(
+    if job['state'] == 'pending':
+        return render_template(STATUS_TEMPLATE, job_id=job_id), 202
+    if job['state'] == 'failed':
+        flash(f"Error generating Agreement: {job['error']}", "error")
+        return render_template('index.html', data=get_form_data({}))
+    flash("Agreement generated successfully!", "success")
+    viewer_links(job['pdf_filename'])
+    return redirect(url_for('view_pdf', filename=job['pdf_filename']))
+
+# nginx internal locations that alias the generated-file directories. With
+# USE_X_ACCEL=1 (only when nginx fronts every route to the app) downloads
+# are answered with X-Accel-Redirect and nginx serves these files itself
+# with sendfile (see deploy/nginx.conf). It is a deployment setting rather
+# than a request header, which any client could send.
+USE_X_ACCEL = os.getenv('USE_X_ACCEL', '0') == '1'
+ACCEL_LOCATIONS = {
+    app.config['OUTPUT_DIR'].replace('\\', '/'): '/protected/pdf/',
+    app.config['DOCX_DIR'].replace('\\', '/'): '/protected/docx/',
+}
+
+@lru_cache(maxsize=None)
+def chunked_file_wrapper(base):
+    """Subclass of a WSGI server's file_wrapper class that reads
+    FILE_CHUNK_SIZE blocks, where send_file always asks for 8 KiB. Servers
+    recognise their wrapper with isinstance() before using sendfile(), which
+    instances of the subclass still pass."""
+    class ChunkedFileWrapper(base):
+        def __init__(self, file, buffer_size=None):
+            super().__init__(file, FILE_CHUNK_SIZE)
+    return ChunkedFileWrapper
+
+def send_user_file(filepath, stat, mimetype, as_attachment, download_name=None):
+    if request.environ.get('asgi.scope', {}).get(SENDFILE_SCOPE_KEY):
+        # Running under asgi: Flask still answers conditional and Range
+        # checks, SendfileMiddleware sends the file body
+        return werkzeug_send_file(
             filepath,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
+            request.environ,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            use_x_sendfile=True,
+            response_class=app.response_class,
+            max_age=app.get_send_file_max_age
         )
+    directory, name = os.path.split(filepath)
+    location = ACCEL_LOCATIONS.get(directory)
+    if location is None or not USE_X_ACCEL:
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if file_wrapper is None:
+            logger.debug("WSGI server has no wsgi.file_wrapper; file will be streamed through Python")
+            file_wrapper = FileWrapper
+        if isinstance(file_wrapper, type):
+            request.environ['wsgi.file_wrapper'] = chunked_file_wrapper(file_wrapper)
+        # Given a path, send_file would stat it again; hand it the open file
+        # and fill in what it would have read from the stat ourselves (same
+        # ETag format as send_file uses for paths)
+        file = open_for_streaming(filepath)
+        try:
+            response = send_file(
+                file,
+                mimetype=mimetype,
+                as_attachment=as_attachment,
+                download_name=download_name or name,
+                etag=f"{stat.st_mtime}-{stat.st_size}-{adler32(os.path.abspath(filepath).encode()) & 0xFFFFFFFF}",
+                last_modified=stat.st_mtime
+            )
+            response.content_length = stat.st_size
+            return response.make_conditional(request.environ, accept_ranges=True, complete_length=stat.st_size)
+        except BaseException:
+            file.close()
+            raise
+    download_name = download_name or name
+    try:
+        download_name.encode('ascii')
+        names = {'filename': download_name}
+    except UnicodeEncodeError:
+        names = {
+            'filename': unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii'),
+            'filename*': f"UTF-8''{quote(download_name, safe='')}"
+        }
+    response = app.response_class(mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', **names)
+    response.headers['X-Accel-Redirect'] = location + quote(name)
+    return response
+
+# Scope key SendfileMiddleware sets on every request it forwards. a2wsgi
+# exposes the scope as environ['asgi.scope'], which, unlike a header, a
+# client cannot put there.
+SENDFILE_SCOPE_KEY = 'msa.sendfile'
+
+class SendfileMiddleware:
+    """ASGI wrapper around the Flask app. Views still run as WSGI through
+    a2wsgi, but when one answers with X-Sendfile the body is sent by
+    Starlette's FileResponse, which hands the path to the server as an
+    http.response.pathsend event (sendfile from file to socket) if the server
+    supports that extension, and otherwise streams it off the worker thread."""
+
+    def __init__(self, wsgi_app):
+        self.app = WSGIMiddleware(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        scope = dict(scope, **{SENDFILE_SCOPE_KEY: True})
+        file_response = None
+
+        async def send_or_sendfile(message):
+            nonlocal file_response
+            if message['type'] == 'http.response.start':
+                headers = [(k.lower(), v) for k, v in message['headers']]
+                path = dict(headers).get(b'x-sendfile')
+                if path and message['status'] in (200, 206):
+                    # FileResponse works out Range and Content-Length itself
+                    file_response = FileResponse(os.fsdecode(path))
+                    file_response.raw_headers[:] = [
+                        (k, v) for k, v in headers if k not in (b'x-sendfile', b'content-length', b'content-range')
+                    ]
+                    return
+            elif file_response is not None:
+                if not message.get('more_body'):
+                    await file_response(scope, receive, send)
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_or_sendfile)
+
+# Downloads in flight per username; a user's entry is dropped when their
+# last download finishes, so the mapping only holds users downloading now
+_download_slots = {}
+_download_slots_lock = threading.Lock()
+
+def limit_user_downloads(view):
+    """Reject a download with 429 while its user already has
+    USER_DOWNLOAD_LIMIT in flight. A slot is held until the response body has
+    been sent, not just until the view returns."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'user' not in session:
+            return view(*args, **kwargs)
+        username = session['user']['username']
+        with _download_slots_lock:
+            in_flight = _download_slots.get(username, 0)
+            if in_flight < USER_DOWNLOAD_LIMIT:
+                _download_slots[username] = in_flight + 1
+        if in_flight >= USER_DOWNLOAD_LIMIT:
+            logger.warning(f"Download limit reached for user {username}")
+            return "Too many downloads in progress. Please wait for one to finish.", 429
+        released = []
+        def release():
+            if not released:
+                released.append(True)
+                with _download_slots_lock:
+                    if _download_slots[username] > 1:
+                        _download_slots[username] -= 1
+                    else:
+                        del _download_slots[username]
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            release()
+            raise
+        body = response.response
+        if not response.direct_passthrough:
+            response.call_on_close(release)
+        elif hasattr(body, 'close'):
+            # send_file bodies go to the server untouched, so call_on_close
+            # hooks never run; release when the server closes the file
+            close = body.close
+            def close_and_release():
+                try:
+                    close()
+                finally:
+                    release()
+            body.close = close_and_release
+        else:
+            release()
+        return response
+    return wrapper
+
+# What /file/<kind>/<filename> sends for each kind: registry kind, MIME
+# type, whether it is an attachment, and the noun used in messages
+FILE_KINDS = {
+    'view': ('pdf', 'application/pdf', False, 'PDF'),
+    'pdf': ('pdf', 'application/pdf', True, 'PDF'),
+    'docx': ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', True, 'document'),
+}
+
+@app.route('/file/<kind>/<filename>')
+@limit_user_downloads
+def serve_file(kind, filename):
+    if kind not in FILE_KINDS:
+        abort(404)
+    registry_kind, mimetype, as_attachment, noun = FILE_KINDS[kind]
+    if 'user' not in session:
+        flash(f"Please log in to access {noun}s.", "error")
+        return redirect(url_for('login'))
+    filepath, stat = user_file(registry_kind, filename)
+    if stat is None:
+        flash(f"{noun[:1].upper()}{noun[1:]} not found.", "error")
+        logger.error(f"{registry_kind.upper()} not found for {kind}: {filepath}")
+        return redirect(url_for('index'))
+    try:
+        response = send_user_file(filepath, stat, mimetype=mimetype, as_attachment=as_attachment)
+        # Lets the PDF viewer's repeated Range requests come from the browser cache
+        response.headers['Cache-Control'] = f"private, max-age={FILE_MAX_AGE}, immutable"
+        return response
     except Exception as e:
-        logger.error(f"Error downloading PDF file: {e}")
-        flash("Error downloading PDF.", "error")
+        logger.error(f"Error sending {registry_kind.upper()} file: {e}")
+        flash(f"Error {'downloading' if as_attachment else 'serving'} {noun}.", "error")
         return redirect(url_for('index'))
 
-@app.route('/download_docx/<filename>')
-def download_docx(filename):
+class _ZipChunks:
+    """Write-only file object for zipfile that keeps what was written until
+    stream_zip drains it. zipfile writes data descriptors instead of seeking
+    back, since it has no tell()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(entries):
+    """Yield a ZIP archive of (arcname, filepath) entries while it is being
+    written, in blocks of up to FILE_CHUNK_SIZE, so memory use doesn't grow
+    with the archive.
+
+    Entries are deflated even though PDFs and DOCX files barely shrink:
+    every entry carries a data descriptor, which streaming unzippers (Java's
+    ZipInputStream, some mobile and browser extractors) can only handle
+    after a deflated entry. Files that vanish
+    before they are read, e.g. to a concurrent logout, are left out rather
+    than cutting off a response whose headers are already sent.
+    """
+    out = _ZipChunks()
+    with ZipFile(out, 'w', ZIP_DEFLATED) as archive:
+        for arcname, filepath in entries:
+            try:
+                info = ZipInfo.from_file(filepath, arcname)
+                src = open_for_streaming(filepath)
+            except FileNotFoundError:
+                logger.warning(f"Skipping {filepath} in ZIP download: file no longer exists")
+                continue
+            info.compress_type = ZIP_DEFLATED
+            with src, archive.open(info, 'w') as dest:
+                while chunk := src.read(FILE_CHUNK_SIZE):
+                    dest.write(chunk)
+                    yield out.drain()
+            yield out.drain()
+    yield out.drain()
+
+@app.route('/download_all')
+@limit_user_downloads
+def download_all():
     if 'user' not in session:
         flash("Please log in to access documents.", "error")
         return redirect(url_for('login'))
-    filepath = session.get('docxs', {}).get(filename)
-    if not filepath or not os.path.exists(filepath):
-        flash("Document not found.", "error")
-        logger.error(f"DOCX not found for download: {filepath}")
-        return redirect(url_for('index'))
-    try:
-        return send_file(
-            filepath,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            as_attachment=True,
-            download_name=filename.replace('.pdf', '.docx')
-        )
-    except Exception as e:
-        logger.error(f"Error downloading DOCX file: {e}")
-        flash("Error downloading document.", "error")
+    entries = []
+    for kind, name in FILE_REGISTRY.files(session_id()):
+        if kind in FILE_ROOTS:
+            filepath, stat = user_file(kind, name)
+            if stat is not None:
+                entries.append((os.path.basename(filepath), filepath))
+    if not entries:
+        flash("No agreements to download yet.", "error")
         return redirect(url_for('index'))
+    response = app.response_class(stream_zip(entries), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename='agreements.zip')
+    return response
+
+# The per-kind URLs files were served from before /file/, still reachable from
+# bookmarks and already open viewer pages
+app.add_url_rule('/serve_pdf/<filename>', 'serve_pdf', serve_file, defaults={'kind': 'view'})
+app.add_url_rule('/download_pdf/<filename>', 'download_pdf', serve_file, defaults={'kind': 'pdf'})
+app.add_url_rule('/download_docx/<filename>', 'download_docx', serve_file, defaults={'kind': 'docx'})
+
+VIEW_PDF_TEMPLATE = app.jinja_env.get_template('view_pdf.html')
+
+def viewer_links(filename):
+    """Links on an agreement's viewer page. Built once when the agreement is
+    generated and reused for every later view of it."""
+    return _viewer_links(request.host_url, filename)
+
+@lru_cache(maxsize=4096)
+def _viewer_links(host_url, filename):
+    # The links depend only on the host URL (scheme, host and script root)
+    # and the filename; url_for reads the former from the current request
+    return {
+        'pdf_url': url_for('serve_file', kind='view', filename=filename, _external=True),
+        'download_pdf_url': url_for('serve_file', kind='pdf', filename=filename),
+        'download_docx_url': url_for('serve_file', kind='docx', filename=filename),
+        'download_all_url': url_for('download_all'),
+    }
 
 @app.route('/view_pdf/<filename>')
 def view_pdf(filename):
     if 'user' not in session:
         flash("Please log in to view PDFs.", "error")
         return redirect(url_for('login'))
-    filepath = session.get('pdfs', {}).get(filename)
-    if not filepath or not os.path.exists(filepath):
+    filepath, stat = user_file('pdf', filename)
+    if stat is None:
         logger.error(f"PDF not found: {filepath}")
         flash("PDF not found.", "error")
         return redirect(url_for('index'))
     try:
-        pdf_url = url_for('serve_pdf', filename=filename, _external=True)
-        logger.info(f"Serving PDF at URL: {pdf_url} for file: {filename}")
-        return render_template('view_pdf.html', pdf_filename=filename, pdf_url=pdf_url)
+        links = viewer_links(filename)
+        # Every page view passes here; leave the message unformatted unless
+        # debug logging is on
+        logger.debug("Serving PDF at URL: %s for file: %s", links['pdf_url'], filename)
+        return render_template(VIEW_PDF_TEMPLATE, **links)
     except Exception as e:
         logger.error(f"Error preparing PDF for viewing: {e}")
         flash("Error loading PDF.", "error")
         return redirect(url_for('index'))
 
-@app.route('/serve_pdf/<filename>')
-def serve_pdf(filename):
-    if 'user' not in session:
-        flash("Please log in to access PDFs.", "error")
-        return redirect(url_for('login'))
-    filepath = session.get('pdfs', {}).get(filename)
-    if not filepath or not os.path.exists(filepath):
-        flash("PDF not found.", "error")
-        logger.error(f"PDF not found for serving: {filepath}")
-        return redirect(url_for('index'))
-    try:
-        return send_file(
-            filepath,
-            mimetype='application/pdf',
-            as_attachment=False
-        )
-    except Exception as e:
-        logger.error(f"Error serving PDF file: {e}")
-        flash("Error serving PDF.", "error")
-        return redirect(url_for('index'))
+# ASGI entry point (uvicorn app:asgi), available when a2wsgi and starlette are installed
+asgi = SendfileMiddleware(app) if WSGIMiddleware else None
 
+# Development server only; deployments run under gunicorn with
+# deploy/gunicorn_conf.py
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
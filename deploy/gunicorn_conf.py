@@ -0,0 +1,35 @@
+# Gunicorn settings for the MSA generator:
+#
+#     gunicorn -c deploy/gunicorn_conf.py app:app
+#
+# Workers are threaded (gthread) rather than gevent: agreement generation
+# relies on real threads (the LibreOffice pool and its UNO bridge, background
+# jobs, the log listener), which gevent's monkey patching would turn into
+# greenlets. Each worker thread serves one request, so downloads no longer
+# wait on each other, and with nginx in front (deploy/nginx.conf) the file
+# bytes are sent by nginx anyway.
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5000')
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# Generating an agreement can take a while on a cold LibreOffice worker
+timeout = 300
+keepalive = 5
+
+# Every worker process runs its own LibreOffice pool. Give each one a slot
+# so their ports and profiles don't overlap; a replacement worker reuses the
+# slot of the one it replaces.
+SOFFICE_POOL_SIZE = int(os.getenv('SOFFICE_POOL_SIZE', '2'))
+
+
+def pre_fork(server, worker):
+    taken = {getattr(w, 'soffice_slot', None) for w in server.WORKERS.values()}
+    worker.soffice_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    os.environ['SOFFICE_FIRST_INDEX'] = str(worker.soffice_slot * SOFFICE_POOL_SIZE)
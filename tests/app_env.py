@@ -0,0 +1,42 @@
+"""Imports app.py for the tests.
+
+app.py creates its working directories and SQLite database in the current
+directory at import, so it is imported from a scratch directory, with a stub
+LibreOffice that writes a small PDF for every document it is asked to
+convert.
+"""
+
+import os
+import stat
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix='msa-tests-')
+
+STUB_SOFFICE = os.path.join(WORK_DIR, 'soffice')
+with open(STUB_SOFFICE, 'w') as f:
+    f.write(f'''#!{sys.executable}
+import os, sys
+args, outdir, files = sys.argv[1:], None, []
+while args:
+    arg = args.pop(0)
+    if arg == '--outdir':
+        outdir = args.pop(0)
+    elif arg == '--convert-to':
+        args.pop(0)
+    elif not arg.startswith('-'):
+        files.append(arg)
+for path in files:
+    name = os.path.splitext(os.path.basename(path))[0] + '.pdf'
+    with open(os.path.join(outdir, name), 'wb') as pdf:
+        pdf.write(b'%PDF-1.4\\n%%EOF\\n')
+''')
+os.chmod(STUB_SOFFICE, os.stat(STUB_SOFFICE).st_mode | stat.S_IEXEC)
+
+os.environ['LIBREOFFICE_PATH'] = STUB_SOFFICE
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.chdir(WORK_DIR)
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
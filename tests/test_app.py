@@ -0,0 +1,277 @@
+"""Flask test-client tests for agreement generation, downloads and the
+server-side session stores."""
+
+import base64
+import io
+import os
+import struct
+import time
+import unittest
+import zipfile
+import zlib
+
+from app_env import app as msa
+
+
+def png_bytes(width=40, height=20):
+    """A small valid RGB PNG."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + b'\x00\x00\x00' * width for _ in range(height))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(rows))
+        + chunk(b'IEND', b'')
+    )
+
+
+SIGNATURE_DATA_URI = 'data:image/png;base64,' + base64.b64encode(png_bytes()).decode('ascii')
+
+FORM = {
+    'name': 'Acme Co',
+    'websiteUrl': 'https://acme.example',
+    'registrationNumber': 'R-1',
+    'headquartersLocation': 'Chennai',
+    'countriesOfOperation': 'IN',
+    'businessType': 'Services',
+    'industryType': 'IT',
+    'billingAddress': '1 Main St',
+    'billing_contact_name': 'Asha',
+    'billing_email': 'asha@acme.example',
+    'start_date': '2024-01-02',
+    'contact_person_designation': 'CFO',
+    'contact_person_number': '123',
+    'chervic_date': '2024-01-03',
+    'contact_person_sign_date': '2024-01-04',
+    'chervic_signature_data': SIGNATURE_DATA_URI,
+    'contact_person_signature_data': SIGNATURE_DATA_URI,
+}
+
+
+def logged_in_client(username='user'):
+    client = msa.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = {'id': 1, 'username': username, 'role': 'BUSINESS_DEVELOPMENT_USER'}
+        sess['cookies'] = {}
+    return client
+
+
+def session_sid(client):
+    with client.session_transaction() as sess:
+        return sess['sid']
+
+
+def wait_for_job(client, location, timeout=60):
+    """Poll a /status/<job_id> URL until the job leaves 'pending'."""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(location)
+        if response.status_code != 202 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.05)
+
+
+def generate(client, **fields):
+    response = client.post('/submit', data=dict(FORM, **fields))
+    assert response.status_code == 302, response.data
+    response = wait_for_job(client, response.headers['Location'])
+    assert response.status_code == 302, response.data
+    return response.headers['Location'].rsplit('/', 1)[1]
+
+
+class ValidationTest(unittest.TestCase):
+
+    def test_validate_date(self):
+        self.assertTrue(msa.validate_date('2024-02-29'))
+        self.assertTrue(msa.validate_date('2024-1-5'))
+        self.assertFalse(msa.validate_date('2023-02-29'))
+        self.assertFalse(msa.validate_date('2024/01/05'))
+        self.assertFalse(msa.validate_date('2024-01-05x'))
+        self.assertFalse(msa.validate_date(''))
+
+    def test_sanitize_input(self):
+        self.assertEqual(msa.sanitize_input(None), '')
+        self.assertEqual(msa.sanitize_input('  plain  '), 'plain')
+        self.assertEqual(msa.sanitize_input('<a href="x">\'&\'</a>'), '&lt;a href=&quot;x&quot;&gt;&#x27;&amp;&#x27;&lt;/a&gt;')
+
+
+class JobStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = logged_in_client()
+        self.client.get('/status/none')
+        self.sid = session_sid(self.client)
+
+    def tearDown(self):
+        msa.PDF_JOB_STORE.clear(self.sid)
+
+    def test_pending_job_returns_202(self):
+        msa.PDF_JOB_STORE.create('pending-job', self.sid)
+        response = self.client.get('/status/pending-job')
+        self.assertEqual(response.status_code, 202)
+        self.assertIn(b'Go back to the form', response.data)
+
+    def test_stale_pending_job_fails(self):
+        msa.PDF_JOB_STORE.create('stale-job', self.sid)
+        with msa.PDF_JOB_STORE._connect() as conn:
+            conn.execute("UPDATE pdf_jobs SET created_at = 0 WHERE id = 'stale-job'")
+        response = self.client.get('/status/stale-job')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Generation did not finish', response.data)
+        self.assertEqual(msa.PDF_JOB_STORE.get('stale-job', self.sid)['state'], 'failed')
+
+    def test_done_job_redirects_on_every_reload(self):
+        msa.PDF_JOB_STORE.create('done-job', self.sid)
+        msa.PDF_JOB_STORE.finish('done-job', pdf_filename='agreement.pdf')
+        for _ in range(2):
+            response = self.client.get('/status/done-job')
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.headers['Location'].endswith('/view_pdf/agreement.pdf'))
+
+    def test_other_sessions_job_is_not_found(self):
+        msa.PDF_JOB_STORE.create('foreign-job', 'another-session')
+        try:
+            response = self.client.get('/status/foreign-job')
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.headers['Location'].endswith('/'))
+        finally:
+            msa.PDF_JOB_STORE.clear('another-session')
+
+
+class GenerationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = logged_in_client()
+
+    def tearDown(self):
+        self.client.get('/logout')
+
+    def test_generate_view_and_download(self):
+        filename = generate(self.client)
+        self.assertEqual(self.client.get(f'/view_pdf/{filename}').status_code, 200)
+        response = self.client.get(f'/file/pdf/{filename}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_data().startswith(b'%PDF'))
+        response.close()
+        response = self.client.get(f'/file/docx/{filename}')
+        self.assertEqual(response.status_code, 200)
+        document = zipfile.ZipFile(io.BytesIO(response.get_data())).read('word/document.xml')
+        response.close()
+        self.assertIn(b'Acme Co', document)
+        self.assertNotIn(b'{{', document)
+
+    def test_identical_submission_reuses_rendering(self):
+        filename = generate(self.client)
+        pdf_filepath = os.path.join(msa.app.config['OUTPUT_DIR'], filename)
+        mtime = os.stat(pdf_filepath).st_mtime_ns
+        self.assertEqual(generate(self.client), filename)
+        self.assertEqual(os.stat(pdf_filepath).st_mtime_ns, mtime)
+        self.assertNotEqual(generate(self.client, billing_contact_name='Ravi'), filename)
+
+    def test_invalid_signature_is_rejected_on_the_form(self):
+        response = self.client.post('/submit', data=dict(FORM, chervic_signature_data='data:image/png;base64,aGVsbG8='))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Failed to process Chervic canvas signature', response.data)
+
+    def test_logout_keeps_files_other_sessions_use(self):
+        other = logged_in_client('other')
+        filename = generate(self.client)
+        self.assertEqual(generate(other), filename)
+        self.client.get('/logout')
+        response = other.get(f'/file/pdf/{filename}')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        other.get('/logout')
+        self.assertFalse(os.path.exists(os.path.join(msa.app.config['OUTPUT_DIR'], filename)))
+
+
+class DownloadLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = logged_in_client('limited')
+        self.filename = generate(self.client)
+        self.limit = msa.USER_DOWNLOAD_LIMIT
+        msa.USER_DOWNLOAD_LIMIT = 1
+
+    def tearDown(self):
+        msa.USER_DOWNLOAD_LIMIT = self.limit
+        self.client.get('/logout')
+
+    def test_slot_is_held_until_the_body_is_closed(self):
+        held = self.client.get(f'/file/pdf/{self.filename}', buffered=False)
+        self.assertEqual(held.status_code, 200)
+        self.assertEqual(self.client.get(f'/file/pdf/{self.filename}').status_code, 429)
+        held.close()
+        self.assertNotIn('limited', msa._download_slots)
+        response = self.client.get(f'/file/pdf/{self.filename}')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertNotIn('limited', msa._download_slots)
+
+
+class StreamZipTest(unittest.TestCase):
+
+    def test_entries_are_deflated_and_missing_files_skipped(self):
+        first = os.path.join(msa.app.config['OUTPUT_DIR'], 'zip-first.pdf')
+        second = os.path.join(msa.app.config['DOCX_DIR'], 'zip-second.docx')
+        with open(first, 'wb') as f:
+            f.write(b'%PDF' + os.urandom(3000))
+        with open(second, 'wb') as f:
+            f.write(b'PK' * 2000)
+        try:
+            entries = [('first.pdf', first), ('gone.pdf', first + '.missing'), ('second.docx', second)]
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(msa.stream_zip(entries))))
+            self.assertEqual(archive.namelist(), ['first.pdf', 'second.docx'])
+            self.assertIsNone(archive.testzip())
+            self.assertEqual({info.compress_type for info in archive.infolist()}, {zipfile.ZIP_DEFLATED})
+            with open(first, 'rb') as f:
+                self.assertEqual(archive.read('first.pdf'), f.read())
+        finally:
+            os.unlink(first)
+            os.unlink(second)
+
+    def test_download_all(self):
+        client = logged_in_client('zipper')
+        try:
+            filename = generate(client)
+            response = client.get('/download_all')
+            self.assertEqual(response.status_code, 200)
+            archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+            self.assertEqual(sorted(archive.namelist()), sorted([filename, filename[:-4] + '.docx']))
+        finally:
+            client.get('/logout')
+
+
+class PurgeTest(unittest.TestCase):
+
+    def age(self, owner):
+        with msa.FILE_REGISTRY._connect() as conn:
+            for table in ('files', 'form_data', 'pdf_jobs'):
+                conn.execute(f'UPDATE {table} SET updated_at = 0 WHERE owner = ?', (owner,))
+
+    def test_expired_rows_and_their_files_are_removed(self):
+        signature = os.path.join(msa.app.config['SIGNATURE_DIR'], 'purge-signature.png')
+        shared = os.path.join(msa.app.config['OUTPUT_DIR'], 'purge-shared.pdf')
+        for path in (signature, shared):
+            open(path, 'wb').close()
+        msa.FILE_REGISTRY.add('expired', 'signature', 'purge-signature.png', signature)
+        msa.FILE_REGISTRY.add('expired', 'pdf', 'purge-shared.pdf', shared)
+        msa.FILE_REGISTRY.add('active', 'pdf', 'purge-shared.pdf', shared)
+        msa.FORM_DATA.set('expired', {'name': 'x'})
+        msa.PDF_JOB_STORE.create('purge-job', 'expired')
+        self.age('expired')
+        try:
+            msa.purge_expired_sessions()
+            self.assertEqual(msa.FILE_REGISTRY.files('expired'), [])
+            self.assertIsNone(msa.FORM_DATA.get('expired'))
+            self.assertFalse(msa.PDF_JOB_STORE.exists('purge-job'))
+            self.assertFalse(os.path.exists(signature))
+            self.assertTrue(os.path.exists(shared))
+            self.assertEqual(msa.FILE_REGISTRY.files('active'), [('pdf', 'purge-shared.pdf')])
+        finally:
+            msa.remove_files(msa.FILE_REGISTRY.clear('active'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+"""app.py patches and calls private python-docx internals; fail loudly if an
+upgrade renames or reshapes any of them."""
+
+import inspect
+import unittest
+from io import BytesIO
+
+from docx.opc.phys_pkg import PhysPkgWriter
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml.document import CT_Body
+from docx.package import ImageParts
+
+
+class PythonDocxInternalsTest(unittest.TestCase):
+
+    def test_package_writer_write_parts(self):
+        # app._write_parts replaces it, so it must still exist, take the same
+        # arguments and be what PackageWriter.write calls
+        self.assertEqual(list(inspect.signature(PackageWriter._write_parts).parameters), ['phys_writer', 'parts'])
+        self.assertIn('PackageWriter._write_parts(phys_writer, parts)', inspect.getsource(PackageWriter.write))
+
+    def test_phys_writer_zipfile(self):
+        phys_writer = PhysPkgWriter(BytesIO())
+        try:
+            self.assertTrue(hasattr(phys_writer._zipf, 'open'))
+            self.assertTrue(callable(phys_writer.write))
+        finally:
+            phys_writer.close()
+
+    def test_image_parts_lookup(self):
+        self.assertTrue(callable(ImageParts._get_by_sha1))
+        self.assertTrue(callable(ImageParts._add_image_part))
+
+    def test_body_insert_tbl(self):
+        self.assertTrue(callable(CT_Body._insert_tbl))
+
+
+if __name__ == '__main__':
+    unittest.main()